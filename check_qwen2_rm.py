@@ -0,0 +1,139 @@
+"""
+CPU checks for qwen2_rm.py: reward pooling on a small flattened batch, and the checkpoint
+routing table plus load_weights against a randomly initialized tiny Qwen2 checkpoint.
+Needs torch, transformers and vllm (a CPU build is enough); no GPU and no downloaded weights.
+
+    python check_qwen2_rm.py
+"""
+import os
+import sys
+import importlib.util
+import torch
+from torch import nn
+from transformers import Qwen2Config, Qwen2Model
+
+STEP_TAG = 7
+# checkpoint tensor -> (fused vLLM parameter, shard id)
+FUSED = {"q_proj": ("qkv_proj", "q"), "k_proj": ("qkv_proj", "k"), "v_proj": ("qkv_proj", "v"),
+         "gate_proj": ("gate_up_proj", 0), "up_proj": ("gate_up_proj", 1)}
+
+def load_qwen2_rm():
+    # qwen2_rm.py imports vllm's models/utils relatively, so load it as a module of that package
+    import vllm.model_executor.models as models
+    name = models.__name__ + ".qwen2_rm"
+    spec = importlib.util.spec_from_file_location(name, os.path.join(os.path.dirname(os.path.abspath(__file__)), "qwen2_rm.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def check_pooling(rm):
+    # three sequences flattened the way vLLM hands them to the pooler: (total tokens, 1)
+    token_ids = [[1, STEP_TAG, 2], [STEP_TAG, 3, STEP_TAG, 4], [5, 6]]
+    lens = [len(ids) for ids in token_ids]
+    scores = torch.arange(sum(lens), dtype=torch.float32).reshape(-1, 1)
+
+    assert rm.pool_scores(scores, lens, "last") == [[2.0], [6.0], [8.0]]
+    assert rm.pool_scores(scores, lens, "all") == [[0.0, 1.0, 2.0], [3.0, 4.0, 5.0, 6.0], [7.0, 8.0]]
+    # rewards at each step tag, then the final reward; the last sequence has no step tag
+    assert rm.pool_scores(scores, lens, "step", token_ids, STEP_TAG) == [[1.0, 2.0], [3.0, 5.0, 6.0], [8.0]]
+    assert rm.pool_scores(scores[:2], [2], "step", [[5, 6]], STEP_TAG) == [[1.0]]
+
+    # served output is unchanged unless a pooling mode is asked for
+    os.environ.pop("QWEN2_RM_POOLING", None)
+    assert rm.RewardPooler.from_config(Qwen2Config(num_hidden_layers=1)).mode == "all"
+    for mode in ("last", "step"):
+        config = Qwen2Config(num_hidden_layers=1, reward_pooling=mode, reward_step_tag_id=STEP_TAG)
+        pooler = rm.RewardPooler.from_config(config)
+        assert (pooler.mode, pooler.step_tag_id) == (mode, STEP_TAG)
+    try:
+        rm.RewardPooler("step")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("step pooling without a step tag id was accepted")
+
+def tiny_config():
+    return Qwen2Config(vocab_size=64, hidden_size=16, intermediate_size=32, num_hidden_layers=2,
+                       num_attention_heads=4, num_key_value_heads=2)
+
+def synthetic_checkpoint(config):
+    """(name, tensor) pairs as a HF Qwen2 reward checkpoint stores them, randomly initialized"""
+    torch.manual_seed(0)
+    weights = [("model." + name, tensor) for name, tensor in Qwen2Model(config).state_dict().items()]
+    weights += [("score.0.weight", torch.randn(config.hidden_size, config.hidden_size)),
+                ("score.0.bias", torch.randn(config.hidden_size)),
+                ("score.2.weight", torch.randn(1, config.hidden_size)),
+                ("score.2.bias", torch.randn(1)),
+                ("lm_head.weight", torch.randn(config.vocab_size, config.hidden_size))]
+    return weights
+
+def vllm_param_names(config):
+    """Parameter names of Qwen2ForRewardModel, with vLLM's fused qkv_proj / gate_up_proj"""
+    names = ["model.embed_tokens.weight", "model.norm.weight",
+             "score.0.weight", "score.0.bias", "score.2.weight", "score.2.bias"]
+    for i in range(config.num_hidden_layers):
+        names += [f"model.layers.{i}.{name}" for name in (
+            "self_attn.qkv_proj.weight", "self_attn.qkv_proj.bias", "self_attn.o_proj.weight",
+            "mlp.gate_up_proj.weight", "mlp.down_proj.weight",
+            "input_layernorm.weight", "post_attention_layernorm.weight")]
+    return names
+
+def expected_route(name):
+    for weight_name, (param_name, shard_id) in FUSED.items():
+        if f".{weight_name}." in name:
+            return name.replace(f".{weight_name}.", f".{param_name}."), shard_id
+    return name, None
+
+class FakeRewardModel(nn.Module):
+    """Just the parameter names of the real model; every weight loader records what it got"""
+
+    def __init__(self, names):
+        super().__init__()
+        self.calls = []
+        self.params = {}
+        for name in names:
+            param = nn.Parameter(torch.empty(0), requires_grad=False)
+            param.weight_loader = lambda param, weight, shard_id=None, name=name: self.calls.append((name, shard_id, weight))
+            self.params[name] = param
+
+    def named_parameters(self, prefix="", recurse=True, remove_duplicate=True):
+        return iter(self.params.items())
+
+def check_routing(rm):
+    config = tiny_config()
+    weights = synthetic_checkpoint(config)
+    params = vllm_param_names(config)
+    routes = rm.build_weight_routes(params)
+
+    checkpoint_names = [name for name, _ in weights if name != "lm_head.weight" and "rotary_emb" not in name]
+    for name in checkpoint_names:
+        assert routes.get(name) == expected_route(name), (name, routes.get(name))
+    assert "lm_head.weight" not in routes
+    # q, k, v weights and biases plus gate and up per layer go to a shard of a fused parameter
+    assert sum(routes[name][1] is not None for name in checkpoint_names) == config.num_hidden_layers * 8
+    # every parameter is reached by some checkpoint tensor
+    assert {routes[name][0] for name in checkpoint_names} == set(params)
+
+    # parameters of other pipeline stages are left out, so their tensors are skipped
+    stage = rm.build_weight_routes(params, is_missing=lambda name: ".layers.1." in name)
+    assert not any(".layers.1." in name for name in stage)
+    assert all(stage[name] == routes[name] for name in stage)
+
+    # load_weights hands each tensor to its parameter's loader with the right shard id
+    model = FakeRewardModel(params)
+    rm.Qwen2ForRewardModel.load_weights(model, iter(weights))
+    by_name = dict(weights)
+    assert len(model.calls) == len(checkpoint_names)
+    for (param_name, shard_id, weight), name in zip(model.calls, checkpoint_names):
+        assert (param_name, shard_id) == expected_route(name) and weight is by_name[name]
+    assert set(model.load_timings) == {"read", "route", "copy"}
+
+def main():
+    rm = load_qwen2_rm()
+    check_pooling(rm)
+    check_routing(rm)
+    print("qwen2_rm checks passed")
+
+if __name__ == "__main__":
+    main()
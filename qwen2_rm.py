@@ -5,7 +5,10 @@
 # Copyright 2024 The Qwen team.
 # Copyright 2023 The vLLM team.
 """Inference-only Qwen2-RM model compatible with HuggingFace weights."""
-from typing import Iterable, List, Optional, Tuple
+import os
+import time
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 import torch
 from torch import nn
@@ -21,11 +24,12 @@ from vllm.model_executor.model_loader.weight_utils import (
     maybe_remap_kv_scale_name,
 )
 from vllm.model_executor.models.qwen2 import Qwen2Model
-from vllm.model_executor.pooling_metadata import PoolingMetadata
-from vllm.sequence import IntermediateTensors, PoolerOutput
+from vllm.model_executor.pooling_metadata import PoolingMetadata, PoolingTensors
+from vllm.sequence import EmbeddingSequenceGroupOutput, IntermediateTensors, PoolerOutput
 
 from .utils import is_pp_missing_parameter
 
+logger = logging.getLogger(__name__)
 
 class ReLU(nn.Module):
 
@@ -38,6 +42,118 @@ class ReLU(nn.Module):
         return self.activation(input)
 
 
+POOLING_MODES = ("last", "step", "all")
+
+
+def pool_scores(
+    scores: torch.Tensor,
+    prompt_lens: Sequence[int],
+    mode: str = "last",
+    token_ids: Optional[Sequence[Sequence[int]]] = None,
+    step_tag_id: Optional[int] = None,
+) -> List[List[float]]:
+    """Reduce flattened per-token scores of a batch to what each sequence returns.
+
+    last: [reward of the final token].
+    step: rewards at every step_tag_id token, followed by the final-token reward.
+    all:  every token's score.
+    The final reward is always the last element, so clients can read embedding[-1].
+    """
+    scores = scores.reshape(-1).float()
+    lens = torch.as_tensor(list(prompt_lens), device=scores.device)
+    ends = torch.cumsum(lens, 0)
+    if mode == "last":
+        return [[r] for r in scores[ends - 1].tolist()]
+    outputs = []
+    for seq, ids in zip(torch.split(scores, lens.tolist()), token_ids or [None] * len(lens)):
+        if mode == "all":
+            outputs.append(seq.tolist())
+        else:
+            mask = torch.as_tensor(ids, device=seq.device) == step_tag_id
+            outputs.append(seq[mask].tolist() + [seq[-1].item()])
+    return outputs
+
+
+class RewardPooler(nn.Module):
+    """Pooler returning only the rewards asked for instead of every token's score.
+
+    The mode comes from config.reward_pooling or $QWEN2_RM_POOLING. The default "all" keeps
+    vLLM's PoolingType.ALL behaviour (every token's score), so existing clients see the same
+    output; "last" sends only the final reward. "step" also needs config.reward_step_tag_id
+    or $QWEN2_RM_STEP_TAG_ID.
+    """
+
+    def __init__(self, mode: str = "all", step_tag_id: Optional[int] = None):
+        super().__init__()
+        if mode not in POOLING_MODES:
+            raise ValueError(f"reward pooling must be one of {POOLING_MODES}, got {mode!r}")
+        if mode == "step" and step_tag_id is None:
+            raise ValueError("step reward pooling needs a step tag token id")
+        self.mode = mode
+        self.step_tag_id = step_tag_id
+        self._all = Pooler(pooling_type=PoolingType.ALL, normalize=False)
+
+    @classmethod
+    def from_config(cls, config: Qwen2Config) -> "RewardPooler":
+        mode = getattr(config, "reward_pooling", None) or os.environ.get("QWEN2_RM_POOLING", "all")
+        step_tag_id = getattr(config, "reward_step_tag_id", None) or os.environ.get("QWEN2_RM_STEP_TAG_ID")
+        return cls(mode, int(step_tag_id) if step_tag_id is not None else None)
+
+    def forward(
+        self, hidden_states: torch.Tensor, pooling_metadata: PoolingMetadata
+    ) -> PoolerOutput:
+        if self.mode == "all":
+            return self._all(hidden_states, pooling_metadata)
+        prompt_lens = PoolingTensors.from_pooling_metadata(
+            pooling_metadata, hidden_states.device
+        ).prompt_lens
+        token_ids = None
+        if self.mode == "step":
+            token_ids = [
+                pooling_metadata.seq_data[seq_ids[0]].prompt_token_ids
+                for seq_ids, _ in pooling_metadata.seq_groups
+            ]
+        pooled = pool_scores(
+            hidden_states, prompt_lens.tolist(), self.mode, token_ids, self.step_tag_id
+        )
+        return PoolerOutput(outputs=[EmbeddingSequenceGroupOutput(data) for data in pooled])
+
+
+STACKED_PARAMS_MAPPING = [
+    # (param_name, shard_name, shard_id)
+    ("qkv_proj", "q_proj", "q"),
+    ("qkv_proj", "k_proj", "k"),
+    ("qkv_proj", "v_proj", "v"),
+    ("gate_up_proj", "gate_proj", 0),
+    ("gate_up_proj", "up_proj", 1),
+]
+
+# (param name, shard id or None for an unsharded parameter)
+WeightRoute = Tuple[str, Optional[Union[str, int]]]
+
+
+def build_weight_routes(
+    param_names: Iterable[str],
+    stacked_params_mapping: Sequence[Tuple[str, str, Union[str, int]]] = STACKED_PARAMS_MAPPING,
+    is_missing: Callable[[str], bool] = lambda name: False,
+) -> Dict[str, WeightRoute]:
+    """Checkpoint tensor name -> (param name, shard id), built once from the model's parameters.
+
+    Every parameter routes from its own name; fused parameters also route from the name of
+    each checkpoint tensor stacked into them (q_proj -> qkv_proj shard "q", ...). Parameters
+    is_missing reports (other pipeline stages) are left out, so their tensors are skipped.
+    """
+    routes = {}
+    for name in param_names:
+        if is_missing(name):
+            continue
+        routes[name] = (name, None)
+        for param_name, weight_name, shard_id in stacked_params_mapping:
+            if f".{param_name}." in name:
+                routes[name.replace(f".{param_name}.", f".{weight_name}.")] = (name, shard_id)
+    return routes
+
+
 class Qwen2ForRewardModel(nn.Module):
     packed_modules_mapping = {
         "qkv_proj": [
@@ -99,7 +215,7 @@ class Qwen2ForRewardModel(nn.Module):
             ReLU(),
             RowParallelLinear(config.hidden_size, 1, quant_config=quant_config),
         )
-        self._pooler = Pooler(pooling_type=PoolingType.ALL, normalize=False)
+        self._pooler = RewardPooler.from_config(config)
 
     def forward(
         self,
@@ -123,44 +239,46 @@ class Qwen2ForRewardModel(nn.Module):
         return self._pooler(hidden_states, pooling_metadata)
 
     def load_weights(self, weights: Iterable[Tuple[str, torch.Tensor]]):
-        stacked_params_mapping = [
-            # (param_name, shard_name, shard_id)
-            ("qkv_proj", "q_proj", "q"),
-            ("qkv_proj", "k_proj", "k"),
-            ("qkv_proj", "v_proj", "v"),
-            ("gate_up_proj", "gate_proj", 0),
-            ("gate_up_proj", "up_proj", 1),
-        ]
+        """Load the tensors vLLM's loader yields. The seconds spent waiting on its iterator
+        (read), looking up routes (route) and in weight loaders (copy) are logged and kept
+        in self.load_timings."""
         params_dict = dict(self.named_parameters(remove_duplicate=False))
+        routes = build_weight_routes(
+            params_dict, is_missing=lambda name: is_pp_missing_parameter(name, self)
+        )
+        timings = {"read": 0.0, "route": 0.0, "copy": 0.0}
+        loaded = 0
+        mark = time.perf_counter()
         for name, loaded_weight in weights:
-            # Skip loading lm_head for embedding model
-            if name == "lm_head.weight":
+            now = time.perf_counter()
+            timings["read"] += now - mark
+            route = routes.get(name)
+            if route is None:
+                # Skip lm_head for embedding model, rotary caches, extra GPTQ biases and
+                # parameters of other pipeline stages.
+                remapped = None
+                if not (name == "lm_head.weight" or "rotary_emb.inv_freq" in name or name.endswith(".bias")):
+                    # Remapping the name of FP8 kv-scale.
+                    remapped = maybe_remap_kv_scale_name(name, params_dict)
+                    if remapped is not None and is_pp_missing_parameter(remapped, self):
+                        remapped = None
+                route = routes.get(remapped) if remapped is not None else None
+            mark = time.perf_counter()
+            timings["route"] += mark - now
+            if route is None:
                 continue
-            if "rotary_emb.inv_freq" in name:
-                continue
-            for param_name, weight_name, shard_id in stacked_params_mapping:
-                if weight_name not in name:
-                    continue
-                name = name.replace(weight_name, param_name)
-                # Skip loading extra bias for GPTQ models.
-                if name.endswith(".bias") and name not in params_dict:
-                    continue
-                if is_pp_missing_parameter(name, self):
-                    continue
-                param = params_dict[name]
-                weight_loader = param.weight_loader
-                weight_loader(param, loaded_weight, shard_id)
-                break
+            param_name, shard_id = route
+            param = params_dict[param_name]
+            if shard_id is None:
+                getattr(param, "weight_loader", default_weight_loader)(param, loaded_weight)
             else:
-                # Skip loading extra bias for GPTQ models.
-                if name.endswith(".bias") and name not in params_dict:
-                    continue
-                # Remapping the name of FP8 kv-scale.
-                name = maybe_remap_kv_scale_name(name, params_dict)
-                if name is None:
-                    continue
-                if is_pp_missing_parameter(name, self):
-                    continue
-                param = params_dict[name]
-                weight_loader = getattr(param, "weight_loader", default_weight_loader)
-                weight_loader(param, loaded_weight)
+                param.weight_loader(param, loaded_weight, shard_id)
+            now = time.perf_counter()
+            timings["copy"] += now - mark
+            mark = now
+            loaded += 1
+        logger.info(
+            "loaded %d tensors: %.2fs reading, %.2fs routing, %.2fs copying",
+            loaded, timings["read"], timings["route"], timings["copy"],
+        )
+        self.load_timings = timings
@@ -0,0 +1,102 @@
+import os
+import sys
+import asyncio
+import logging
+import time
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
+from tqdm import tqdm
+
+# the retry policy is shared with src/api_backend.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from retry_policy import is_retryable, backoff
+
+logger = logging.getLogger(__name__)
+
+class RewardClient:
+    """
+    Scores rendered conversations against a vLLM reward-model server's embeddings endpoint.
+    Packs batch_size messages per request and keeps at most max_in_flight requests open over
+    one shared connection pool. Transient failures are retried with backoff; a batch rejected
+    outright (e.g. one over-long input) is split in half until the bad row is isolated. Rows
+    that never succeed are left as NaN and reported, never written as a sentinel reward.
+
+    The reward is the last element of each embedding, whatever pooling qwen2_rm.py runs
+    with; under "last" pooling (QWEN2_RM_POOLING=last) it is the only element sent. With
+    return_steps (for a server in "step" pooling) the per-step rewards before it are
+    returned as stats["step_rewards"], None for failed rows.
+    """
+
+    def __init__(self, base_url, api_key="EMPTY", model=None, batch_size=32, max_in_flight=8,
+                 max_retries=5, timeout=600.0, return_steps=False):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.return_steps = return_steps
+
+    async def _request(self, client, messages, attempt):
+        if attempt:
+            await asyncio.sleep(backoff(attempt))
+        response = await client.embeddings.create(input=messages, model=self.model)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    async def score_async(self, messages, progress=True):
+        limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+        rewards = np.full(len(messages), np.nan)
+        steps = [None] * len(messages)
+        stats = {"rows": len(messages), "requests": 0, "retries": 0, "splits": 0, "failed_rows": []}
+        queue = [(list(range(i, min(i + self.batch_size, len(messages)))), 0)
+                 for i in range(0, len(messages), self.batch_size)]
+        queue.reverse()
+        in_flight = {}
+        bar = tqdm(total=len(messages), disable=not progress)
+        start = time.perf_counter()
+
+        async with httpx.AsyncClient(limits=limits, timeout=self.timeout) as http_client:
+            client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=http_client, max_retries=0)
+            if self.model is None:
+                self.model = (await client.models.list()).data[0].id
+            while queue or in_flight:
+                while queue and len(in_flight) < self.max_in_flight:
+                    indices, attempt = queue.pop()
+                    task = asyncio.create_task(self._request(client, [messages[i] for i in indices], attempt))
+                    in_flight[task] = (indices, attempt)
+                    stats["requests"] += 1
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    indices, attempt = in_flight.pop(task)
+                    try:
+                        embeddings = task.result()
+                        rewards[indices] = [embedding[-1] for embedding in embeddings]
+                        if self.return_steps:
+                            for i, embedding in zip(indices, embeddings):
+                                steps[i] = embedding[:-1]
+                        bar.update(len(indices))
+                    except Exception as e:
+                        if is_retryable(e, (httpx.TransportError,)) and attempt < self.max_retries:
+                            stats["retries"] += 1
+                            queue.append((indices, attempt + 1))
+                        elif len(indices) > 1:
+                            stats["splits"] += 1
+                            half = len(indices) // 2
+                            queue.extend([(indices[half:], attempt), (indices[:half], attempt)])
+                        else:
+                            logger.warning("row %d failed after %d attempts: %s", indices[0], attempt + 1, e)
+                            stats["failed_rows"].append(indices[0])
+                            bar.update(1)
+        bar.close()
+
+        elapsed = time.perf_counter() - start
+        stats["seconds"] = round(elapsed, 2)
+        stats["rows_per_s"] = round(len(messages) / elapsed, 2) if elapsed > 0 else 0
+        if self.return_steps:
+            stats["step_rewards"] = steps
+        return rewards, stats
+
+    def score(self, messages, progress=True):
+        return asyncio.run(self.score_async(messages, progress))
@@ -26,6 +26,12 @@ PROMPT_ID="TBST"
 # export HF_TOKEN="YOUR_HF_TOKEN"
 # export OPENAI_API_KEY="YOUR_OPENAI_API_KEY"
 
+# Optional: keep one model loaded across prompt ids instead of reloading it per run
+#   python src/gen_server.py --model_name "$model_name" --port 8100 &
+#   python src/run_eval.py ... --backend server --server_url http://127.0.0.1:8100
+
+# Optional: add --stream to grade chunks while the next ones generate (local backends)
+
 # Loop through each model and run the Python script
 for model_name in "${models[@]}"; do
   echo "Running evaluation for model: $model_name with categories: $CATEGORIES"
@@ -1,59 +1,124 @@
-import torch
-from transformers import AutoModel, AutoTokenizer
-from openai import OpenAI
+import os
+import json
+import sqlite3
+import hashlib
+import argparse
 import pandas as pd
-from tqdm import tqdm
-from more_itertools import batched
-import time
-
-model_name = "Qwen/Qwen2.5-Math-RM-72B"
-tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
-openai_api_key = "EMPTY"
-openai_api_base = "http://localhost:8081/v1"
-
-client = OpenAI(
-    api_key=openai_api_key,
-    base_url=openai_api_base,
-)
-
-models = client.models.list()
-model = models.data[0].id
-
-df = pd.read_csv('OWM-3M-filtered.csv').dropna()
-
-output = []
-
-for _,row in tqdm(df.iterrows(),total=len(df)):
-    chat = [
-    {"role": "system", "content": "Solve the given question.\nAfter solving the problem, state your final answer in the one of the following format: $\\boxed{N}$."},
-    {"role": "user", "content": row.translated_question},
-    {"role": "assistant", "content": row.translated_solution}
-]
-    conversation_str = tokenizer.apply_chat_template(
-                chat, 
-                tokenize=False, 
-                add_generation_prompt=False
-            )
-    output.append(conversation_str)
-
-df['message'] = output
-
-reward_list = []
-idx = 0
-batch_size=10000
-batches = [df[i:i + batch_size] for i in range(0, df.shape[0], batch_size)]
-for batch in batches:
-    rewards = []
-    for _,row in tqdm(batch.iterrows(),total=10000):
-        try:
-            responses = client.embeddings.create(
-                            input= [row.message],
-                            model=model,
-                        )
-            reward = responses.data[0].embedding[-1]
-        except:
-            reward = -9999
-        rewards.append(reward)
-    batch['reward'] = rewards
-    batch.to_csv(f'data/log-{idx}.csv',index=False)
-    idx+=1
+from transformers import AutoTokenizer
+from rm_client import RewardClient
+
+system_prompt = "Solve the given question.\nAfter solving the problem, state your final answer in the one of the following format: $\\boxed{N}$."
+
+def content_hashes(questions, solutions):
+    return [hashlib.blake2b(f"{q}\x1f{s}".encode("utf-8"), digest_size=16).hexdigest()
+            for q, s in zip(questions, solutions)]
+
+def render_messages(tokenizer, questions, solutions):
+    chats = [[
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": q},
+        {"role": "assistant", "content": s}
+    ] for q, s in zip(questions, solutions)]
+    return tokenizer.apply_chat_template(chats, tokenize=False, add_generation_prompt=False)
+
+class RewardStore:
+    """Rewards already scored, keyed by (question, solution) content hash, kept on disk"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS rewards (key TEXT PRIMARY KEY, reward REAL)")
+
+    def get_many(self, keys, chunk_size=900):
+        found = {}
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self.conn.execute(f"SELECT key, reward FROM rewards WHERE key IN ({placeholders})", chunk))
+        return found
+
+    def put_many(self, items):
+        self.conn.executemany("INSERT OR REPLACE INTO rewards (key, reward) VALUES (?, ?)", items)
+        self.conn.commit()
+
+class Manifest:
+    """Completed chunk ids for one (input file, chunk size) run, so the pipeline can resume"""
+
+    def __init__(self, path, input_file, chunk_size):
+        self.path = path
+        self.state = {"input_file": input_file, "chunk_size": chunk_size, "completed": []}
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if (saved["input_file"], saved["chunk_size"]) != (input_file, chunk_size):
+                raise ValueError(f"{path} was written for {saved['input_file']} with chunk_size {saved['chunk_size']}")
+            self.state = saved
+        self.completed = set(self.state["completed"])
+
+    def mark(self, idx):
+        self.completed.add(idx)
+        self.state["completed"] = sorted(self.completed)
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self.state, f)
+        os.replace(self.path + ".tmp", self.path)
+
+def score_chunk(chunk, tokenizer, client, store):
+    """Score one chunk, sending each (question, solution) pair the store has not seen exactly once"""
+    keys = content_hashes(chunk.translated_question, chunk.translated_solution)
+    unique_keys = list(dict.fromkeys(keys))
+    known = store.get_many(unique_keys)
+    first_row = {}
+    for i, key in enumerate(keys):
+        first_row.setdefault(key, i)
+    todo = [key for key in unique_keys if key not in known]
+    rows = [first_row[key] for key in todo]
+    stats = {"rows": len(chunk), "scored": len(todo), "deduplicated": len(chunk) - len(todo), "failed_rows": []}
+    if todo:
+        messages = render_messages(tokenizer, chunk.translated_question.iloc[rows].tolist(),
+                                   chunk.translated_solution.iloc[rows].tolist())
+        rewards, client_stats = client.score(messages, progress=False)
+        scored = [(key, float(r)) for key, r in zip(todo, rewards) if r == r]
+        store.put_many(scored)
+        known.update(scored)
+        stats.update(rows_per_s=client_stats["rows_per_s"], failed_rows=[todo[i] for i in client_stats["failed_rows"]])
+
+    chunk = chunk.assign(content_hash=keys, reward=[known.get(key, float("nan")) for key in keys])
+    return chunk, stats
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Stream a CSV through the reward-model server in bounded memory',
+        epilog="Only the last element of each embedding is read. qwen2_rm.py still returns every token's "
+               "score by default; serve it with QWEN2_RM_POOLING=last to send just the reward.")
+    parser.add_argument('--input_file', type=str, default='OWM-3M-filtered.csv')
+    parser.add_argument('--output_dir', type=str, default='data',
+                        help="Scored rows go to output_dir/parts/*.parquet, readable with pd.read_parquet.")
+    parser.add_argument('--model_name', type=str, default="Qwen/Qwen2.5-Math-RM-72B")
+    parser.add_argument('--api_base', type=str, default="http://localhost:8081/v1")
+    parser.add_argument('--chunk_size', type=int, default=10000, help="Rows read, rendered and scored at a time.")
+    parser.add_argument('--batch_size', type=int, default=32, help="Messages per embeddings request.")
+    parser.add_argument('--max_in_flight', type=int, default=8, help="Concurrent embeddings requests.")
+    args = parser.parse_args()
+
+    parts_dir = os.path.join(args.output_dir, "parts")
+    os.makedirs(parts_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(args.model_name, trust_remote_code=True)
+    client = RewardClient(args.api_base, api_key="EMPTY", batch_size=args.batch_size, max_in_flight=args.max_in_flight)
+    store = RewardStore(os.path.join(args.output_dir, "rewards.sqlite"))
+    manifest = Manifest(os.path.join(args.output_dir, "manifest.json"), args.input_file, args.chunk_size)
+
+    for idx, chunk in enumerate(pd.read_csv(args.input_file, chunksize=args.chunk_size)):
+        if idx in manifest.completed:
+            continue
+        chunk, stats = score_chunk(chunk.dropna(), tokenizer, client, store)
+        part_path = os.path.join(parts_dir, f"part-{idx:05d}.parquet")
+        chunk.to_parquet(part_path + ".tmp", index=False, compression="zstd")
+        os.replace(part_path + ".tmp", part_path)
+        # a chunk with failed rows stays incomplete: the next run rescores just those (the rest are in the store)
+        if not stats['failed_rows']:
+            manifest.mark(idx)
+        print(f"chunk {idx}: {stats['rows']} rows, {stats['scored']} scored, {stats['deduplicated']} deduplicated, "
+              f"{len(stats['failed_rows'])} failed, {stats.get('rows_per_s', 0)} rows/s"
+              + (" (incomplete; rerun to retry the failed rows)" if stats['failed_rows'] else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+import litellm
+from retry_policy import is_retryable, backoff
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Refills at rate_per_minute units per minute up to capacity; acquire() waits for enough units"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity or max(rate_per_minute / 6, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+def estimate_tokens(messages, max_tokens):
+    return sum(len(m["content"]) for m in messages) // 4 + max_tokens
+
+async def complete_all(model, prompts, row_ids, on_result, concurrency=16, rpm=500, tpm=200_000,
+                       max_retries=8, max_tokens=2048, n=1, on_error=None, **completion_kwargs):
+    """
+    Send every prompt through litellm.acompletion with at most `concurrency` requests in
+    flight, request/token rate limits, and jittered retries on 429s and transient errors.
+    on_result(row_id, text) is called as each completion arrives; with n > 1 it receives
+    the list of n sampled texts instead. Rows that hit a non-retryable error, still
+    fail after max_retries, come back with no choices or make on_result raise go to
+    on_error(row_id, message) if given (and are left out otherwise); no row's failure
+    stops the others. Returned stats include token usage and the latency (seconds) of every
+    successful request.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    requests, tokens = TokenBucket(rpm), TokenBucket(tpm)
+    stats = {"completed": 0, "failed": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0, "latencies": []}
+
+    def fail(row_id, message, attempts):
+        logger.warning("row %s failed after %d attempts: %s", row_id, attempts, message)
+        if on_error is not None:
+            on_error(row_id, message)
+        stats["failed"] += 1
+
+    async def complete_one(row_id, messages):
+        async with semaphore:
+            for attempt in range(max_retries + 1):
+                await requests.acquire(1)
+                await tokens.acquire(estimate_tokens(messages, max_tokens * n))
+                start = time.monotonic()
+                try:
+                    response = await litellm.acompletion(model=model, messages=messages, max_tokens=max_tokens,
+                                                         **({"n": n} if n > 1 else {}), **completion_kwargs)
+                except Exception as e:
+                    if attempt == max_retries or not is_retryable(e):
+                        fail(row_id, f"{type(e).__name__}: {e}", attempt + 1)
+                        return
+                    stats["retries"] += 1
+                    await asyncio.sleep(backoff(attempt))
+                    continue
+                stats["latencies"].append(time.monotonic() - start)
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    stats["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+                    stats["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+                texts = [choice.message.content or "" for choice in response.choices or []]
+                if not texts:
+                    fail(row_id, "EmptyResponse: the provider returned no choices", attempt + 1)
+                    return
+                try:
+                    on_result(row_id, texts if n > 1 else texts[0])
+                except Exception as e:
+                    fail(row_id, f"{type(e).__name__} in on_result: {e}", attempt + 1)
+                    return
+                stats["completed"] += 1
+                return
+
+    # one row's failure (even inside on_error) must not cancel the rows still in flight
+    results = await asyncio.gather(*(complete_one(row_id, messages) for row_id, messages in zip(row_ids, prompts)),
+                                   return_exceptions=True)
+    for row_id, result in zip(row_ids, results):
+        if isinstance(result, Exception):
+            logger.error("row %s could not be recorded: %s: %s", row_id, type(result).__name__, result)
+            stats["failed"] += 1
+    return stats
+
+def generate_api(model, prompts, row_ids, on_result, **kwargs):
+    return asyncio.run(complete_all(model, prompts, row_ids, on_result, **kwargs))
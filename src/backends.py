@@ -0,0 +1,118 @@
+import json
+import time
+import zlib
+import random
+import urllib.request
+from models import load_vllm_model, sampling_params
+
+class GenerationBackend:
+    """
+    Local generation interface used by run_eval.py. generate() returns, for every prompt,
+    the list of its n completions and adds prompt/completion token counts to record.
+    """
+
+    model_name = None
+
+    def generate(self, prompts, n=1, seed=None, record=None):
+        raise NotImplementedError
+
+    def sampling_key(self, n=1, seed=None):
+        """Everything besides model and prompt that determines the completions (response cache key)"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class VLLMBackend(GenerationBackend):
+    """A vLLM engine loaded in this process"""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.llm, _ = load_vllm_model(model_name)
+
+    def generate(self, prompts, n=1, seed=None, record=None):
+        outputs = self.llm.generate(prompts, sampling_params(n, seed))
+        if record is not None:
+            record.add(prompt_tokens=sum(len(output.prompt_token_ids or []) for output in outputs),
+                       completion_tokens=sum(len(o.token_ids) for output in outputs for o in output.outputs))
+        return [[o.text.strip("</s2>") for o in output.outputs] for output in outputs]
+
+    def sampling_key(self, n=1, seed=None):
+        return repr(sampling_params(n, seed))
+
+class FakeBackend(GenerationBackend):
+    """
+    Deterministic CPU stand-in. Completions depend only on (prompt, sample index, seed): they
+    box the gold answer with probability p_correct when `answers` maps the prompt to one,
+    and a prompt-derived number otherwise. delay (seconds per prompt) simulates generation time.
+    """
+
+    def __init__(self, model_name="fake", p_correct=0.5, delay=0.0, answers=None):
+        self.model_name = model_name
+        self.p_correct = p_correct
+        self.delay = delay
+        self.answers = answers if answers is not None else {}
+
+    @staticmethod
+    def _text(prompt):
+        return prompt if isinstance(prompt, str) else json.dumps(prompt, ensure_ascii=False, sort_keys=True)
+
+    def generate(self, prompts, n=1, seed=None, record=None):
+        outputs = []
+        for prompt in prompts:
+            text = self._text(prompt)
+            samples = []
+            for i in range(n):
+                rng = random.Random(zlib.crc32(f"{seed}\x1f{i}\x1f{text}".encode("utf-8")))
+                gold = self.answers.get(text)
+                answer = gold if gold is not None and rng.random() < self.p_correct else rng.randint(10_000, 10_003)
+                samples.append(f"Let me think.\nThe answer is $\\boxed{{{answer}}}$.")
+            outputs.append(samples)
+        if self.delay:
+            time.sleep(self.delay * len(prompts))
+        if record is not None:
+            record.add(prompt_tokens=sum(len(self._text(p).split()) for p in prompts),
+                       completion_tokens=sum(len(s.split()) for samples in outputs for s in samples))
+        return outputs
+
+    def expect(self, prompts, answers):
+        """Register gold answers so completions can be right with probability p_correct"""
+        self.answers.update((self._text(p), str(a)) for p, a in zip(prompts, answers))
+
+    def sampling_key(self, n=1, seed=None):
+        return {"fake": True, "p_correct": self.p_correct, "n": n}
+
+class ServerBackend(GenerationBackend):
+    """Client for a gen_server.py process that keeps a model loaded across run_eval.py runs"""
+
+    def __init__(self, url, model_name=None, timeout=None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.info = self._request("/info")
+        self.model_name = self.info["model"]
+        if model_name is not None and model_name != self.model_name:
+            raise ValueError(f"server at {self.url} serves {self.model_name}, not {model_name}")
+
+    def _request(self, path, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def generate(self, prompts, n=1, seed=None, record=None):
+        response = self._request("/generate", {"prompts": prompts, "n": n, "seed": seed})
+        if record is not None:
+            record.add(prompt_tokens=response["prompt_tokens"], completion_tokens=response["completion_tokens"])
+        return response["outputs"]
+
+    def sampling_key(self, n=1, seed=None):
+        return self._request("/sampling_key", {"n": n, "seed": seed})["sampling_key"]
+
+def make_backend(kind, model_name, server_url=None, fake_p_correct=0.5, fake_delay=0.0):
+    if kind == "vllm":
+        return VLLMBackend(model_name)
+    if kind == "server":
+        return ServerBackend(server_url, model_name)
+    if kind == "fake":
+        return FakeBackend(model_name, fake_p_correct, fake_delay)
+    raise ValueError(f"Unknown backend: {kind}")
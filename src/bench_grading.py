@@ -0,0 +1,260 @@
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import subprocess
+import os
+import numpy as np
+import grading
+from grading import (answer_in_last_sentence, parse_boxed_value, parse_boxed_content_value,
+                  mcqa_formatting, latex_expressions_equal, set_latex_cache, parse_mcqa_value, parse_ksm_value,
+                  mcqa_formatting_batch, grade_mcqa_batch, grade_ksm_batch, grade_content_batch)
+
+KO_FILLER = ["먼저 주어진 조건을 정리하면", "따라서 양변을 정리하면", "이제 남은 경우를 계산해 보자",
+             "위의 식에 대입하면", "그러므로 구하는 값은"]
+EN_FILLER = ["First, let us restate the problem", "Substituting into the equation gives",
+             "Now we count the remaining cases", "Simplifying both sides", "Therefore the value is"]
+LATEX_ANSWERS = ["\\frac{1}{2}", "\\sqrt{2}", "2\\pi", "x^2+1", "\\frac{3}{4}", "(x+1)^2", "\\dfrac{5}{6}"]
+LATEX_EQUIVALENTS = {"\\frac{1}{2}": "0.5", "\\sqrt{2}": "2^{1/2}", "2\\pi": "\\pi \\cdot 2", "x^2+1": "1+x^2",
+                     "\\frac{3}{4}": "\\frac{6}{8}", "(x+1)^2": "x^2+2x+1", "\\dfrac{5}{6}": "\\frac{10}{12}"}
+
+def _steps(rng, filler, n_steps):
+    lines = []
+    for _ in range(n_steps):
+        a, b = rng.randint(1, 999), rng.randint(1, 999)
+        lines.append(f"{rng.choice(filler)} ${a} + {b} = {a + b}$.")
+    return "\n".join(lines)
+
+def long_solutions(rng, n, filler, closing):
+    """Long multi-step solutions ending in a boxed (and usually restated) numeric answer"""
+    rows = []
+    for _ in range(n):
+        answer = rng.randint(1, 100_000)
+        boxed = f"{answer:,}" if rng.random() < 0.2 else str(answer)
+        text = _steps(rng, filler, rng.randint(20, 80)) + f"\n{closing} $\\boxed{{{boxed}}}$"
+        if rng.random() < 0.7:
+            text += f" {closing} {answer}."
+        rows.append({"question": "", "solution": text, "answer": str(answer if rng.random() < 0.6 else answer + 1)})
+    return rows
+
+def nested_boxed(rng, n):
+    """Boxed LaTeX answers with nested braces, several boxes per solution and symbolic equivalents"""
+    rows = []
+    for _ in range(n):
+        gold = rng.choice(LATEX_ANSWERS)
+        pred = LATEX_EQUIVALENTS[gold] if rng.random() < 0.5 else gold
+        text = (_steps(rng, EN_FILLER, rng.randint(3, 10))
+                + f"\nIntermediate: $\\boxed{{\\frac{{{rng.randint(1, 9)}}}{{\\sqrt{{{rng.randint(2, 9)}}}}}}}$"
+                + f"\nFinal: $\\boxed{{{pred}}}$")
+        rows.append({"question": "", "solution": text, "answer": gold})
+    return rows
+
+def mcqa(rng, n):
+    """
+    Korean MMMLU-style questions with numbered options; answers given as choice number or content.
+    Some questions have numeric options, so a content answer ("7") can look like a choice number.
+    """
+    rows = []
+    for _ in range(n):
+        if rng.random() < 0.3:
+            options = [str(rng.randint(1, 9)) for _ in range(4)]
+        else:
+            options = [f"선택지 {rng.randint(0, 10_000)}" for _ in range(4)]
+        question = "다음 중 옳은 것은?\n" + "\n".join(f"{i}. {o}" for i, o in enumerate(options, 1))
+        choice = rng.randint(1, 4)
+        answer = str(choice) if rng.random() < 0.5 else options[choice - 1]
+        picked = choice if rng.random() < 0.6 else rng.randint(1, 4)
+        solution = _steps(rng, KO_FILLER, rng.randint(5, 20)) + f"\n정답은 $\\boxed{{{picked}}}$ 입니다."
+        rows.append({"question": question, "solution": solution, "answer": answer})
+    return rows
+
+def pathological(rng, n):
+    """Inputs that stress the parsers: huge numbers, unbalanced or deeply nested braces, many boxes, no answer"""
+    makers = [
+        lambda: "9" * 5000 + " " + "1." * 2000,
+        lambda: "\\boxed{" * 200 + "1" + "}" * 150,
+        lambda: " ".join(f"\\boxed{{{i}}}" for i in range(2000)),
+        lambda: "{" * 3000 + "\\boxed{42" + "}" * 10,
+        lambda: "no answer here " * 2000,
+        lambda: "\n".join("." for _ in range(5000)),
+        lambda: "\\boxed{" + "\\frac{1}{" * 100 + "2" + "}" * 101,
+    ]
+    return [{"question": "1. a\n2. b", "solution": rng.choice(makers)(), "answer": "42"} for _ in range(n)]
+
+def make_corpus(n_rows=2000, seed=0):
+    """{dataset type: list of {question, solution, answer}} generated deterministically from seed"""
+    rng = random.Random(seed)
+    return {
+        "ko_long": long_solutions(rng, n_rows, KO_FILLER, "따라서 답은"),
+        "en_long": long_solutions(rng, n_rows, EN_FILLER, "Therefore the answer is"),
+        "nested_boxed": nested_boxed(rng, n_rows),
+        "mcqa": mcqa(rng, n_rows),
+        "pathological": pathological(rng, max(n_rows // 20, 10)),
+    }
+
+BENCHMARKS = {
+    "answer_in_last_sentence": lambda row: answer_in_last_sentence(row["solution"], row["answer"]),
+    "parse_boxed_value": lambda row: parse_boxed_value(row["solution"], row["answer"]),
+    "parse_boxed_content_value": lambda row: parse_boxed_content_value(row["solution"], row["answer"]),
+    "mcqa_formatting": lambda row: mcqa_formatting(row["question"], row["answer"]),
+    "latex_expressions_equal": lambda row: latex_expressions_equal(
+        (grading.extract_boxed(row["solution"]) or [row["solution"][-200:]])[-1], row["answer"]),
+}
+
+def _scalar_mcqa_formatting(row):
+    choice, content = mcqa_formatting(row["question"], row["answer"])
+    return float(choice), str(content)
+
+def _batch_mcqa_formatting(questions, solutions, answers):
+    choices, contents = mcqa_formatting_batch(questions, answers)
+    return list(zip(choices.astype(float), contents.astype(str)))
+
+# scalar reference vs its vectorized counterpart; both must agree on every row
+PARITY_CHECKS = {
+    "mcqa_formatting": (_scalar_mcqa_formatting, _batch_mcqa_formatting),
+    "parse_mcqa_value": (lambda row: parse_mcqa_value(row["question"], row["solution"], row["answer"]),
+                         grade_mcqa_batch),
+    "parse_ksm_value": (lambda row: parse_ksm_value(row["question"], row["solution"], row["answer"]),
+                        grade_ksm_batch),
+    "parse_boxed_content_value": (lambda row: parse_boxed_content_value(row["solution"], row["answer"]),
+                                  lambda questions, solutions, answers: grade_content_batch(solutions, answers)),
+}
+
+def _same(a, b):
+    if isinstance(a, tuple):
+        return all(_same(x, y) for x, y in zip(a, b))
+    return a == b or (a != a and b != b)  # NaN choices agree with each other
+
+def parity(corpus, max_rows=500):
+    """Rows where the batch grader disagrees with the scalar one, per check and dataset type"""
+    report = {}
+    for name, (scalar, batch) in PARITY_CHECKS.items():
+        report[name] = {}
+        for dataset, rows in corpus.items():
+            rows = rows[:max_rows]
+            expected, errors = [], 0
+            for row in rows:
+                try:
+                    expected.append(scalar(row))
+                except Exception:
+                    expected.append(None)
+                    errors += 1
+            got = batch([r["question"] for r in rows], [r["solution"] for r in rows], [r["answer"] for r in rows])
+            mismatches = sum(e is not None and not _same(e, g) for e, g in zip(expected, got))
+            report[name][dataset] = {"rows": len(rows), "mismatches": mismatches, "scalar_errors": errors}
+            print("parity", name, dataset, report[name][dataset], file=sys.stderr)
+    return report
+
+def time_calls(fn, rows, repeat=3):
+    """
+    Best-of-repeat rows/s plus per-call latency percentiles (microseconds) over all repeats,
+    and how many equivalence checks per pass each tier decided
+    """
+    latencies, totals, errors = [], [], 0
+    grading.tier_counts.clear()
+    for _ in range(repeat):
+        set_latex_cache()  # measure cold symbolic checks, not the memo from the previous repeat
+        start = time.perf_counter()
+        for row in rows:
+            t0 = time.perf_counter_ns()
+            try:
+                fn(row)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter_ns() - t0)
+        totals.append(time.perf_counter() - start)
+    lat = np.array(latencies) / 1000
+    return {
+        "rows": len(rows),
+        "rows_per_s": round(len(rows) / min(totals), 1),
+        "p50_us": round(float(np.percentile(lat, 50)), 2),
+        "p90_us": round(float(np.percentile(lat, 90)), 2),
+        "p99_us": round(float(np.percentile(lat, 99)), 2),
+        "max_us": round(float(lat.max()), 2),
+        "errors": errors // repeat,
+        "equivalence_tiers": {tier: count // repeat for tier, count in grading.equivalence_stats().items()},
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STARTUP_COMMANDS = {
+    "import grading": ["-c", "import grading"],
+    "check.py --help": [os.path.join(HERE, "check.py"), "--help"],
+    "sc_stats.py --help": [os.path.join(HERE, "sc_stats.py"), "--help"],
+    "sc_compare.py --help": [os.path.join(HERE, "sc_compare.py"), "--help"],
+    # what the first symbolic comparison pays for sympy / latex2sympy
+    "first symbolic compare": ["-c", "import grading; grading.canonical_latex('x+1')"],
+}
+
+def startup_times(repeat=5):
+    """Wall time (s) of fresh interpreters importing the grading entry points: min and median"""
+    results = {}
+    for name, argv in STARTUP_COMMANDS.items():
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *argv], cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+        results[name] = {"min_s": round(min(times), 3), "median_s": round(float(np.median(times)), 3)}
+        print(name, results[name], file=sys.stderr)
+    return results
+
+def run(functions, corpus, repeat=3, latex_rows=200):
+    results = {}
+    for name in functions:
+        results[name] = {}
+        for dataset, rows in corpus.items():
+            # symbolic checks are orders of magnitude slower; bench them on a prefix
+            rows = rows[:latex_rows] if name == "latex_expressions_equal" else rows
+            results[name][dataset] = time_calls(BENCHMARKS[name], rows, repeat)
+            print(name, dataset, results[name][dataset], file=sys.stderr)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the grading and parsing hot paths on a synthetic corpus (CPU only).")
+    parser.add_argument('--rows', type=int, default=2000, help="Rows per dataset type.")
+    parser.add_argument('--latex_rows', type=int, default=200, help="Rows per dataset type for latex_expressions_equal.")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed passes per function and dataset type.")
+    parser.add_argument('--seed', type=int, default=0, help="Corpus seed.")
+    parser.add_argument('--functions', nargs='+', default=list(BENCHMARKS), choices=list(BENCHMARKS),
+                        help="Functions to benchmark.")
+    parser.add_argument('--startup', action='store_true',
+                        help="Also time interpreter startup of the grading entry points.")
+    parser.add_argument('--parity', action='store_true',
+                        help="Also check that the batch graders agree with the scalar ones on the corpus.")
+    parser.add_argument('--output', type=str, default=None, help="JSON report path (stdout if omitted).")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.rows, args.seed)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "seed": args.seed,
+            "rows": args.rows,
+            "latex_rows": args.latex_rows,
+            "repeat": args.repeat,
+        },
+        "results": run(args.functions, corpus, args.repeat, args.latex_rows),
+    }
+    if args.parity:
+        report["parity"] = parity(corpus)
+    if args.startup:
+        report["startup"] = startup_times()
+    text = json.dumps(report, indent=4, sort_keys=True, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
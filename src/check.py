@@ -1,55 +1,63 @@
-import pandas as pd
 import os
 import argparse
-from data import generate_queries_local, generate_queries_litellm, parse_boxed_value, answer_in_last_sentence, parse_mcqa_value, parse_ksm_value
+from grading import set_latex_cache, set_symbolic_grader, equivalence_stats
+from verdict_store import VerdictStore, grade_incremental
+from dataset_store import read_fingerprint
+from sym_pool import SymbolicGrader
+from result_store import ResultStore, STORE_DIR
 import json
 
-def check_func(checking):
-    if checking:
-        return "O"
-    else:
-        return "X"
-
-
-parser = argparse.ArgumentParser(description="Generate predictions and save results to CSV.")
+parser = argparse.ArgumentParser(description="Grade stored results and record the verdicts in the result store.")
 parser.add_argument('--model_name', type=str, default='gpt-4o',
                     help="Name of the model to use for generating predictions.")
 parser.add_argument('--lang_type', type=str, default="ko",
-                    help="Language type of the evaluation sets.")
+                    help="Language type of the evaluation sets (the prompt_id the results were stored under).")
+parser.add_argument('--result_store', type=str, default=STORE_DIR,
+                    help="Root of the partitioned Parquet result store.")
+parser.add_argument('--latex_cache', type=str, default="latex_cache.sqlite",
+                    help="SQLite file persisting symbolic-equivalence verdicts across runs.")
+parser.add_argument('--verdict_cache', type=str, default="verdict_cache.sqlite",
+                    help="SQLite file of per-row verdicts; unchanged rows are not re-graded.")
+parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                    help="Processes used for symbolic (sympy) answer checks.")
+parser.add_argument('--sympy_timeout', type=float, default=10.0,
+                    help="Seconds before a symbolic check is killed and counted as incorrect.")
+parser.add_argument('--max_tasks_per_worker', type=int, default=500,
+                    help="Symbolic checks a worker runs before it is recycled.")
+parser.add_argument('--max_worker_rss_mb', type=int, default=2048,
+                    help="Peak RSS (MB) after which a symbolic worker is recycled.")
 args = parser.parse_args()
 
 model_name = args.model_name
 lang = args.lang_type
-file_path = os.path.join(f"{lang}_results", model_name.replace("/", "_"))
+store = ResultStore(args.result_store)
 data_list = ["GSM8K", "MATH", "OMNI_MATH", "MMMLU", "KSM"]
 scores = {}
-
-os.makedirs(f"{lang}_check_results/{model_name.replace('/', '_')}", exist_ok=True)
+latex_cache = set_latex_cache(args.latex_cache)
+grader = SymbolicGrader(args.workers, args.sympy_timeout, args.max_tasks_per_worker, args.max_worker_rss_mb)
+set_symbolic_grader(grader)
+verdicts = VerdictStore(args.verdict_cache)
 
 for d in data_list:
-    df_result = pd.read_csv(os.path.join(file_path, f"{d}.csv"))
-    checks = []
-    if d in ["GSM8K", "MATH", "OMNI_MATH"]:
-        score = sum([1 for _,row in df_result.iterrows() if any([answer_in_last_sentence(row.solution,row.answer),parse_boxed_value(row.solution,row.answer)])])/len(df_result)*100
-        for i in range(len(df_result)):
-            checks.append(check_func(any([answer_in_last_sentence(df_result.loc[i, "solution"],df_result.loc[i, "answer"]),parse_boxed_value(df_result.loc[i, "solution"],df_result.loc[i, "answer"])])))
-    elif d == "MMMLU":
-        score = sum([1 for _,row in df_result.iterrows() if any([parse_mcqa_value(row.question,row.solution,row.answer)])])/len(df_result)*100
-        for i in range(len(df_result)):
-            checks.append(check_func(parse_mcqa_value(df_result.loc[i, "question"],df_result.loc[i, "solution"],df_result.loc[i, "answer"])))
-    elif d == "KSM":
-        score = sum([1 for _,row in df_result.iterrows() if parse_ksm_value(row.question,row.solution,row.answer)])/len(df_result)*100
-        for i in range(len(df_result)):
-            checks.append(check_func(parse_ksm_value(df_result.loc[i, "question"],df_result.loc[i, "solution"],df_result.loc[i, "answer"])))
+    df_result = store.load(model_name, lang, d, columns=["question", "answer", "solution"])
+    correct, graded = grade_incremental(verdicts, d, df_result.solution, df_result.answer, df_result.question,
+                                        namespace=read_fingerprint(d) or "")
+    print(f"{d}: graded {graded} new or changed rows, reused {len(df_result) - graded}")
+    score = correct.mean()*100
     scores[d] = score
-    df_result["check"] = checks
-    df_result.to_csv(f"{lang}_check_results/{model_name.replace('/', '_')}/{d}_check.csv")
+    store.write_verdicts(model_name, lang, d, correct)
 
 
 os.makedirs(f"{lang}_check_json_result", exist_ok=True)
 with open(f"{lang}_check_json_result/{model_name.replace('/', '_')}.json", "w") as f:
     json.dump(scores, f, indent=4)
+latex_cache.close()
+grader.close()
+verdicts.close()
 
 print(f'########### {model_name} ###########')
 for k,v in scores.items():
-    print(k, v)
\ No newline at end of file
+    print(k, v)
+print('equivalence tiers', equivalence_stats())
+print('latex cache', latex_cache.stats())
+print('symbolic grader', grader.stats())
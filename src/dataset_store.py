@@ -0,0 +1,50 @@
+import os
+import json
+import pandas as pd
+import pyarrow as pa
+from data import dataset_fingerprint
+
+DATASET_REPO = 'HAERAE-HUB/HRM8K'
+STORE_DIR = os.environ.get("KSM_DATASET_STORE", os.path.expanduser("~/.cache/ksm/hrm8k"))
+
+def _paths(cat, store_dir):
+    return os.path.join(store_dir, f"{cat}.arrow"), os.path.join(store_dir, f"{cat}.json")
+
+def snapshot(cat, store_dir=STORE_DIR, repo=DATASET_REPO, split='test'):
+    """Download one category once and write it as an Arrow IPC file plus its content fingerprint"""
+    from datasets import load_dataset
+    df = pd.DataFrame(load_dataset(repo, cat)[split])
+    arrow_path, meta_path = _paths(cat, store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(arrow_path + ".tmp", "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(arrow_path + ".tmp", arrow_path)
+    meta = {"repo": repo, "category": cat, "split": split, "rows": len(df), "fingerprint": dataset_fingerprint(df)}
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=4)
+    return meta
+
+def read_fingerprint(cat, store_dir=STORE_DIR):
+    """Fingerprint of a snapshotted category, or None if it was never snapshotted"""
+    _, meta_path = _paths(cat, store_dir)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)["fingerprint"]
+
+def load_category(cat, store_dir=STORE_DIR, offline=False):
+    """
+    Memory-map a snapshotted category into an Arrow-backed DataFrame without copying it.
+    Snapshots on first use unless offline; df.attrs['fingerprint'] carries the content hash.
+    """
+    arrow_path, meta_path = _paths(cat, store_dir)
+    if not os.path.exists(arrow_path):
+        if offline:
+            raise FileNotFoundError(f"{cat} has no snapshot in {store_dir}; run once without --offline")
+        snapshot(cat, store_dir)
+    table = pa.ipc.open_file(pa.memory_map(arrow_path, "r")).read_all()
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    df.attrs["fingerprint"] = read_fingerprint(cat, store_dir)
+    return df
@@ -0,0 +1,196 @@
+"""
+Cheap answer-equivalence tiers tried before the symbolic (sympy) check:
+
+    string    normalized string compare (whitespace, $, \\left/\\right, \\dfrac, \\text{} ...)
+    rational  exact value of common numeric forms: integers and decimals with thousands
+              separators, a/b, \\frac / \\dfrac, \\sqrt of perfect squares, percentages, units
+    numeric   float evaluation of constant expressions (\\sqrt, \\pi, ^, implicit products)
+              within a relative tolerance
+
+Each tier returns True / False when it can decide and None when the pair needs the next one.
+Only the standard library is imported.
+"""
+import ast
+import math
+import operator
+import re
+from fractions import Fraction
+
+TIERS = ("string", "rational", "numeric", "symbolic")
+NUMERIC_REL_TOL = 1e-9
+NUMERIC_ABS_TOL = 1e-12
+
+_wrapper_pattern = re.compile(r'\\(?:text|textbf|mathrm|mathbf|mbox|operatorname)\s*\{([^{}]*)\}')
+_spacing_pattern = re.compile(r'\\[,;:! ]|~|\\(?:quad|qquad|displaystyle|left|right)(?![a-zA-Z])')
+# whitespace collapses to one space, kept only between two letters or digits ("1 2" != "12")
+_whitespace_pattern = re.compile(r'\s+')
+_loose_space_pattern = re.compile(r' (?![0-9A-Za-z])|(?<![0-9A-Za-z]) ')
+_frac_pattern = re.compile(r'\\[dt]frac')
+_thousands_pattern = re.compile(r'(?<=\d)\{,\}(?=\d{3})')
+
+_number = r'[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?|[-+]?\.\d+'
+_number_pattern = re.compile(_number)
+UNITS = ("cm", "mm", "km", "kg", "mg", "ml", "mL", "meters", "metres", "inches", "inch", "feet", "ft",
+         "miles", "mph", "kmh", "hours", "hour", "hrs", "minutes", "mins", "min", "seconds", "sec",
+         "days", "weeks", "years", "dollars", "cents", "units", "degrees")
+# a trailing unit: \text{..} / \mbox{..}, degrees, percent, a Hangul word (원, 개, ...) or one of
+# UNITS; any other trailing letters may be variables ("4xy^2"), so the answer is not a plain number
+_unit_pattern = re.compile(r'(?:\\(?:text|mbox)\s*\{[^{}]*\}|\^\s*\{?\\circ\}?|\\circ|°|\\%|%|[가-힣]+'
+                           r'|(?<![\\a-zA-Z])(?:' + '|'.join(UNITS) + r')(?:\^\{?\d\}?)?)\s*$')
+_rational_patterns = [
+    (re.compile(rf'({_number})/({_number})'), lambda a, b: _ratio(a, b)),
+    (re.compile(rf'([-+]?)\\frac\{{({_number})\}}\{{({_number})\}}'), lambda s, a, b: _sign(s) * _ratio(a, b)),
+    (re.compile(rf'([-+]?)\\frac(\d)(\d)'), lambda s, a, b: _sign(s) * _ratio(a, b)),
+    (re.compile(r'([-+]?)\\sqrt\{(\d+)\}'), lambda s, a: _sign(s) * _isqrt(a)),
+    (re.compile(r'([-+]?)\\sqrt(\d)'), lambda s, a: _sign(s) * _isqrt(a)),
+]
+
+def normalize(expr):
+    """Canonical spelling of a LaTeX answer for the string tier"""
+    expr = str(expr).strip().strip('$').strip()
+    for _ in range(3):
+        expr = _wrapper_pattern.sub(r'\1', expr)
+    expr = _spacing_pattern.sub('', expr)
+    expr = _loose_space_pattern.sub('', _whitespace_pattern.sub(' ', expr))
+    expr = _frac_pattern.sub(r'\\frac', expr)
+    expr = _thousands_pattern.sub(',', expr)
+    expr = expr.replace('\\$', '').rstrip('.')
+    if len(expr) > 2 and expr[0] == '{' and expr[-1] == '}' and expr.count('{') == 1:
+        expr = expr[1:-1]
+    return expr
+
+def _sign(s):
+    return -1 if s == '-' else 1
+
+def _number_value(text):
+    return Fraction(text.replace(',', ''))
+
+def _ratio(a, b):
+    b = _number_value(b)
+    if b == 0:
+        raise ZeroDivisionError
+    return _number_value(a) / b
+
+def _isqrt(text):
+    n = int(text)
+    root = math.isqrt(n)
+    if root * root != n:
+        raise ValueError("not a perfect square")
+    return Fraction(root)
+
+def rational_values(expr):
+    """
+    Exact values a normalized answer may stand for, or None if it is not a plain number.
+    A percentage stands for both p and p / 100; a trailing unit (cm, \\circ, 원, ...) is dropped.
+    """
+    return _rational_values(expr)[0]
+
+def _rational_values(expr):
+    """(rational_values(expr), whether a unit or percent sign was dropped to get them)"""
+    expr = str(expr).strip().strip('$').strip().rstrip('.')
+    percent, stripped = False, False
+    for _ in range(2):
+        unit = _unit_pattern.search(expr)
+        if unit is None or unit.start() == 0:
+            break
+        percent |= unit.group().strip() in ('\\%', '%')
+        stripped = True
+        expr = expr[:unit.start()].rstrip()
+    return _parse_rational(normalize(expr), percent), stripped
+
+def _parse_rational(expr, percent):
+    try:
+        if _number_pattern.fullmatch(expr):
+            value = _number_value(expr)
+        else:
+            for pattern, convert in _rational_patterns:
+                match = pattern.fullmatch(expr)
+                if match:
+                    value = convert(*match.groups())
+                    break
+            else:
+                return None
+    except (ValueError, ZeroDivisionError):
+        return None
+    return (value, value / 100) if percent else (value,)
+
+_command_pattern = re.compile(r'\\(frac|sqrt|pi|cdot|times|div)(?![a-zA-Z])')
+_braced_frac = re.compile(r'\\frac\{([^{}]*)\}\{([^{}]*)\}')
+_braced_sqrt = re.compile(r'\\sqrt\{([^{}]*)\}')
+_digit_frac = re.compile(r'\\frac(\d)(\d)')
+_digit_sqrt = re.compile(r'\\sqrt(\d)')
+_implicit_product = re.compile(r'(?<=[\d)p])(?=[(sp])|(?<=[)p])(?=\d)')
+_operators = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+              ast.Div: operator.truediv, ast.Pow: operator.pow, ast.USub: operator.neg, ast.UAdd: operator.pos}
+
+def _to_python(expr):
+    """Translate a constant LaTeX expression into Python syntax, or None if it has anything else"""
+    expr = normalize(expr).replace('\\%', '/100')
+    # any other command or letter (a variable, \infty, \log, ...) is left to sympy
+    if re.search(r'[a-zA-Z]', _command_pattern.sub('', expr)):
+        return None
+    expr = _digit_frac.sub(r'\\frac{\1}{\2}', _digit_sqrt.sub(r'\\sqrt{\1}', expr))
+    previous = None
+    while previous != expr:
+        previous = expr
+        expr = _braced_frac.sub(r'((\1)/(\2))', expr)
+        expr = _braced_sqrt.sub(r's(\1)', expr)
+    if '\\frac' in expr or '\\sqrt' in expr:
+        return None
+    expr = (expr.replace('\\cdot', '*').replace('\\times', '*').replace('\\div', '/').replace('\\pi', 'p')
+            .replace('^', '**').replace('{', '(').replace('}', ')'))
+    # 2p, 3s(2), (1)(2), 2(3), p2 -> explicit products
+    return _implicit_product.sub('*', expr)
+
+def _evaluate(node):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return float(node.value)
+    if isinstance(node, ast.Name) and node.id == 'p':
+        return math.pi
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 's' and len(node.args) == 1:
+        value = _evaluate(node.args[0])
+        if value < 0:
+            raise ValueError("negative square root")
+        return math.sqrt(value)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _operators:
+        return _operators[type(node.op)](_evaluate(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _operators:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        if isinstance(node.op, ast.Pow) and (abs(right) > 64 or (left < 0 and right != int(right))):
+            raise ValueError("exponent out of range")
+        return _operators[type(node.op)](left, right)
+    raise ValueError("unsupported expression")
+
+def numeric_value(expr):
+    """Float value of a constant LaTeX expression, or None"""
+    text = _to_python(expr)
+    if text is None:
+        return None
+    try:
+        value = _evaluate(ast.parse(text, mode='eval'))
+    except (SyntaxError, ValueError, ZeroDivisionError, OverflowError, RecursionError, TypeError):
+        return None
+    return value if math.isfinite(value) else None
+
+def cheap_equal(solution, answer):
+    """
+    (verdict, tier) from the first cheap tier that decides, else (None, None). A mismatch
+    found only after dropping a unit or percent sign is not final: sympy gets the pair.
+    """
+    if normalize(solution) == normalize(answer):
+        return True, "string"
+    (a, a_stripped), (b, b_stripped) = _rational_values(solution), _rational_values(answer)
+    final = not (a_stripped or b_stripped)
+    if a is not None and b is not None:
+        if any(x == y for x in a for y in b):
+            return True, "rational"
+        return (False, "rational") if final else (None, None)
+    a = [float(v) for v in a] if a is not None else [numeric_value(solution)]
+    b = [float(v) for v in b] if b is not None else [numeric_value(answer)]
+    if None not in a and None not in b:
+        if any(math.isclose(x, y, rel_tol=NUMERIC_REL_TOL, abs_tol=NUMERIC_ABS_TOL) for x in a for y in b):
+            return True, "numeric"
+        return (False, "numeric") if final else (None, None)
+    return None, None
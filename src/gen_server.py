@@ -0,0 +1,89 @@
+"""
+Long-lived generation server: loads a model once and serves many run_eval.py jobs.
+
+    python src/gen_server.py --model_name Qwen/Qwen2.5-7B-Instruct --port 8100
+    python src/run_eval.py --model_name Qwen/Qwen2.5-7B-Instruct --prompt_id ko --backend server
+    python src/run_eval.py --model_name Qwen/Qwen2.5-7B-Instruct --prompt_id en --backend server
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from backends import make_backend
+from instrument import StageRecord
+
+logger = logging.getLogger(__name__)
+
+class GenerationHandler(BaseHTTPRequestHandler):
+    backend = None
+    # one generate() at a time: the engine batches a job's prompts itself
+    lock = threading.Lock()
+    started = time.time()
+    jobs = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/info":
+            self._send(200, {"model": self.backend.model_name, "jobs": GenerationHandler.jobs,
+                             "uptime_s": round(time.time() - self.started, 1)})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        n, seed = request.get("n", 1), request.get("seed")
+        try:
+            if self.path.rstrip("/") == "/generate":
+                self._send(200, self.generate(request["prompts"], n, seed))
+            elif self.path.rstrip("/") == "/sampling_key":
+                self._send(200, {"sampling_key": self.backend.sampling_key(n, seed)})
+            else:
+                self._send(404, {"error": "not found"})
+        except Exception as e:
+            logger.exception("request to %s failed", self.path)
+            self._send(500, {"error": str(e)})
+
+    def generate(self, prompts, n, seed):
+        record = StageRecord()
+        with self.lock:
+            outputs = self.backend.generate(prompts, n, seed, record)
+            GenerationHandler.jobs += 1
+        return {"outputs": outputs, "prompt_tokens": record.get("prompt_tokens", 0),
+                "completion_tokens": record.get("completion_tokens", 0)}
+
+def serve(backend, host="127.0.0.1", port=8100):
+    GenerationHandler.backend = backend
+    server = ThreadingHTTPServer((host, port), GenerationHandler)
+    print(f"serving {backend.model_name} on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        backend.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep a generation backend loaded and serve run_eval.py jobs over HTTP.")
+    parser.add_argument('--model_name', type=str, required=True)
+    parser.add_argument('--backend', type=str, default="vllm", choices=["vllm", "fake"])
+    parser.add_argument('--host', type=str, default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--fake_delay', type=float, default=0.0, help="Seconds per prompt for the fake backend.")
+    args = parser.parse_args()
+    serve(make_backend(args.backend, args.model_name, fake_delay=args.fake_delay), args.host, args.port)
+
+if __name__ == "__main__":
+    main()
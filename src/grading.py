@@ -0,0 +1,306 @@
+"""
+Answer extraction and grading. Only the standard library, numpy and pandas load at import
+time; sympy and latex2sympy are imported on the first symbolic comparison.
+"""
+import re
+import threading
+from collections import Counter
+from typing import NamedTuple, Optional
+import numpy as np
+import pandas as pd
+from latex_cache import LatexCache, MISSING, UNRESOLVED
+from equivalence import TIERS, cheap_equal
+
+NUMERIC_CATEGORIES = ["GSM8K", "MATH", "OMNI_MATH"]
+# categories whose grading can fall back to the symbolic (sympy) tier
+SYMBOLIC_CATEGORIES = ["MMMLU", "KSM"]
+# Bump whenever grading logic changes so persisted per-row verdicts are re-graded.
+GRADER_VERSION = "5"
+
+number_pattern = re.compile(r'\d+\.?\d*')
+boxed_number_pattern = re.compile(r'\s*([\d,]+(?:\.\d+)?)\s*')
+BOXED_OPEN = '\\boxed{'
+box_token_pattern = re.compile(re.escape(BOXED_OPEN) + r'|[{}]')
+choice_patterns = {str(n): re.compile(r'\A(?s:.*)\n' + str(n) + r'\. ([^\n]*)') for n in range(1, 6)}
+
+latex_cache = LatexCache()
+
+def set_latex_cache(path=None, maxsize=100_000, max_rows=2_000_000):
+    """Swap the symbolic-equivalence cache, e.g. for one persisted to SQLite at path"""
+    global latex_cache
+    latex_cache.close()
+    latex_cache = LatexCache(path, maxsize=maxsize, max_rows=max_rows)
+    return latex_cache
+
+def canonical_latex(expr: str):
+    # sympy / latex2sympy take seconds to import; only symbolic comparisons pay for them
+    from latex2sympy2 import latex2sympy
+    from sympy import latex, simplify
+    try:
+        return latex(simplify(latex2sympy(expr)))
+    except:
+        return None
+
+symbolic_grader = None
+
+def set_symbolic_grader(grader):
+    """Route symbolic checks through a sym_pool.SymbolicGrader (None to run them in-process)"""
+    global symbolic_grader
+    symbolic_grader = grader
+
+def local_latex_expressions_equal(solution: str, answer: str) -> bool:
+    return latex_cache.equal(solution, answer, canonical_latex)
+
+# pairs decided by each equivalence tier (equivalence.TIERS); "symbolic" includes latex_cache hits
+tier_counts = Counter()
+# latex_cache and the symbolic grader are not thread-safe; pipeline.StreamingGrader grades from threads
+_symbolic_lock = threading.Lock()
+
+# boxed contents whose symbolic check timed out or crashed; their False verdicts must not be persisted
+unresolved = set()
+
+def take_unresolved():
+    """Return and clear the contents whose symbolic checks were unresolved since the last call"""
+    with _symbolic_lock:
+        contents = set(unresolved)
+        unresolved.clear()
+    return contents
+
+def equivalence_stats():
+    return {tier: tier_counts[tier] for tier in TIERS}
+
+def symbolic_equal_batch(pairs):
+    if symbolic_grader is None:
+        return [local_latex_expressions_equal(solution, answer) for solution, answer in pairs]
+    verdicts = [latex_cache.lookup(solution, answer) for solution, answer in pairs]
+    misses = list(dict.fromkeys(pair for pair, verdict in zip(pairs, verdicts) if verdict is MISSING))
+    # canonical forms live in the parent's cache: workers get the known ones and return the new ones
+    known = latex_cache.forms(expr for pair in misses for expr in pair)
+    forms = dict(known)
+    resolved = dict(zip(misses, symbolic_grader.map(misses, forms)))
+    latex_cache.add_forms({expr: form for expr, form in forms.items() if expr not in known})
+    for (solution, answer), verdict in resolved.items():
+        if verdict is UNRESOLVED:
+            # a timeout depends on machine load, not on the pair: grade it wrong now, retry next run
+            unresolved.add(solution)
+            resolved[solution, answer] = False
+        else:
+            latex_cache.store(solution, answer, verdict)
+    return [resolved[pair] if verdict is MISSING else verdict for pair, verdict in zip(pairs, verdicts)]
+
+def latex_expressions_equal_batch(pairs):
+    """Equivalence of (solution, answer) pairs; sympy only sees pairs no cheap tier decides"""
+    verdicts, symbolic, counts = [], [], Counter()
+    for i, (solution, answer) in enumerate(pairs):
+        verdict, tier = cheap_equal(solution, answer)
+        if tier is None:
+            symbolic.append(i)
+            tier = "symbolic"
+        counts[tier] += 1
+        verdicts.append(verdict)
+    with _symbolic_lock:
+        tier_counts.update(counts)
+        for i, verdict in zip(symbolic, symbolic_equal_batch([pairs[i] for i in symbolic])):
+            verdicts[i] = verdict
+    return verdicts
+
+def latex_expressions_equal(solution: str, answer: str) -> bool:
+    return latex_expressions_equal_batch([(solution, answer)])[0]
+
+def mcqa_formatting(question, answer):
+    number_list = ["\n1. ", "\n2. ", "\n3. ", "\n4. ", "\n5. "]
+    check = {num[1]: question.split(num)[-1].split("\n")[0].strip() for num in number_list if num in question}
+    
+    try:
+        answer_choice = float(answer)
+        answer_content = check[str(answer)]
+    except:
+        answer_content = answer
+        for k, v in check.items():
+            if v == answer_content:
+                answer_choice = float(k)
+
+    return answer_choice, answer_content
+    
+class ExtractedAnswer(NamedTuple):
+    boxed: tuple
+    last_numbers: tuple
+    boxed_number: Optional[float]
+
+def extract_boxed(text):
+    """
+    Every \\boxed{...} content in text, matched by brace depth so nested braces survive.
+    One pass over the braces; boxes that never close are skipped, and boxes inside a
+    closed box belong to its content.
+    """
+    stack, closed = [], []
+    for token in box_token_pattern.finditer(text):
+        if token.group() != '}':
+            stack.append(token.end() if token.group() == BOXED_OPEN else None)
+        elif stack:
+            content_start = stack.pop()
+            if content_start is not None:
+                closed.append((content_start, token.start()))
+    contents, end = [], -1
+    for content_start, content_end in sorted(closed):
+        if content_start > end:
+            contents.append(text[content_start:content_end])
+            end = content_end
+    return tuple(contents)
+
+def extract_answer(text):
+    """Parse a solution once into the record every parse_* function grades against"""
+    if isinstance(text, ExtractedAnswer):
+        return text
+    text = str(text)
+    boxed = extract_boxed(text)
+    last_sentence = text.strip().rsplit('\n', 1)[-1]
+    last_numbers = tuple(float(num) for num in number_pattern.findall(last_sentence))
+    boxed_number = None
+    for content in boxed:
+        match = boxed_number_pattern.fullmatch(content)
+        if match:
+            pred = convert_to_int_safe(match.group(1))
+            boxed_number = pred if isinstance(pred, float) else None
+            break
+    return ExtractedAnswer(boxed, last_numbers, boxed_number)
+
+def answer_in_last_sentence(input_string, answer):
+    numbers_in_last_sentence = extract_answer(input_string).last_numbers
+    if len(numbers_in_last_sentence) > 0:
+        return float(answer) == numbers_in_last_sentence[-1]
+    else:
+        return False
+    
+def convert_to_int_safe(string_number):
+    cleaned = str(string_number).replace(',', '')
+    if re.fullmatch(r'\d+(\.\d+)?', cleaned): 
+        return float(cleaned)
+    else:
+        return string_number
+        
+def parse_boxed_value(text,answer):
+    pred = extract_answer(text).boxed_number
+    if pred is not None:
+        c1 = pred == answer
+        c2 = str(pred) == str(answer)
+        return any([c1,c2])
+    return False
+
+def parse_boxed_content_value(text, answer):
+    boxed = extract_answer(text).boxed
+    if boxed:
+        content = boxed[0].strip()
+        return str(answer) == content or latex_expressions_equal(content, str(answer))
+    return False
+
+def parse_mcqa_value(question, text, answer):
+    answer_choice, answer_content = mcqa_formatting(question, answer)
+    record = extract_answer(text)
+
+    return any([answer_in_last_sentence(record, answer_choice), parse_boxed_value(record, answer_choice), parse_boxed_content_value(record, answer_content)])
+                
+def parse_ksm_value(question,text,answer):
+    record = extract_answer(text)
+    if ("1." in question) and ("2." in question) and ("3." in question) and ("4." in question):
+        return parse_mcqa_value(question, record, answer)
+    else:
+        try:
+            answer = float(answer)
+            return any([answer_in_last_sentence(record, answer), parse_boxed_value(record, answer)])
+        except:
+            return parse_boxed_content_value(record, answer)
+        
+def _as_series(values):
+    return pd.Series(np.asarray(values, dtype=object))
+
+def extract_answer_frame(solutions):
+    """extract_answer over a column, flattened into columns the batch graders compare against"""
+    records = [extract_answer(text) for text in _as_series(solutions)]
+    return pd.DataFrame({
+        'boxed': [record.boxed for record in records],
+        'last_number': [record.last_numbers[-1] if record.last_numbers else np.nan for record in records],
+        'boxed_number': [np.nan if record.boxed_number is None else record.boxed_number for record in records],
+        'boxed_content': [record.boxed[0].strip() if record.boxed else np.nan for record in records],
+    })
+
+def _extracted(solutions, extracted):
+    return extract_answer_frame(solutions) if extracted is None else extracted.reset_index(drop=True)
+
+def _symbolic_fallback(correct, contents, golds):
+    idx = np.flatnonzero(~correct & contents.notna().to_numpy())
+    pairs = [(str(contents.iloc[i]), str(golds.iloc[i])) for i in idx]
+    correct[idx] = latex_expressions_equal_batch(pairs)
+    return correct
+
+def grade_numeric_batch(solutions, answers, extracted=None):
+    """Vectorized answer_in_last_sentence / parse_boxed_value over whole columns"""
+    extracted = _extracted(solutions, extracted)
+    gold = pd.to_numeric(_as_series(answers), errors='coerce')
+    correct = (extracted.last_number == gold) | (extracted.boxed_number == gold)
+    return correct.to_numpy(dtype=bool)
+
+def grade_content_batch(solutions, answers, extracted=None):
+    """Vectorized parse_boxed_content_value; sympy runs only for rows the string compare misses"""
+    extracted, answers = _extracted(solutions, extracted), _as_series(answers)
+    contents = extracted.boxed_content
+    correct = (contents == answers.astype(str)).to_numpy(dtype=bool, copy=True)
+    return _symbolic_fallback(correct, contents, answers)
+
+def mcqa_formatting_batch(questions, answers):
+    """Vectorized mcqa_formatting; returns (answer_choice, answer_content) columns"""
+    questions, answers = _as_series(questions).astype(str), _as_series(answers)
+    options = pd.DataFrame({k: questions.str.extract(p, expand=False).str.strip() for k, p in choice_patterns.items()})
+    answer_str = answers.astype(str)
+    parsed = pd.to_numeric(answers, errors='coerce')
+    answer_choice, answer_content = parsed.copy(), answer_str.astype(object)
+    # like the scalar path: an answer naming an existing option ("2") is that option; any
+    # other string answer, numeric or not ("7"), is matched against the option texts
+    keyed = pd.Series(False, index=answers.index)
+    for k in options.columns:
+        hit = (answer_str == k) & options[k].notna()
+        answer_content = answer_content.mask(hit, options[k])
+        keyed |= hit
+    is_text = ~keyed & answers.map(lambda answer: isinstance(answer, str))
+    for k in options.columns:
+        answer_choice = answer_choice.mask(is_text & (options[k] == answer_str), float(k))
+    return answer_choice, answer_content
+
+def grade_mcqa_batch(questions, solutions, answers, extracted=None):
+    """Vectorized parse_mcqa_value over whole columns"""
+    extracted = _extracted(solutions, extracted)
+    answer_choice, answer_content = mcqa_formatting_batch(questions, answers)
+    contents = extracted.boxed_content
+    correct = (extracted.last_number == answer_choice) | (extracted.boxed_number == answer_choice) | (contents == answer_content.astype(str))
+    return _symbolic_fallback(correct.to_numpy(dtype=bool, copy=True), contents, answer_content)
+
+def grade_ksm_batch(questions, solutions, answers, extracted=None):
+    """Vectorized parse_ksm_value over whole columns"""
+    questions, answers = _as_series(questions).astype(str), _as_series(answers)
+    extracted = _extracted(solutions, extracted)
+    is_mcqa = np.ones(len(questions), dtype=bool)
+    for marker in ["1.", "2.", "3.", "4."]:
+        is_mcqa &= questions.str.contains(marker, regex=False).to_numpy(dtype=bool)
+    is_numeric = ~is_mcqa & pd.to_numeric(answers, errors='coerce').notna().to_numpy()
+    is_content = ~is_mcqa & ~is_numeric
+
+    correct = np.zeros(len(questions), dtype=bool)
+    for mask, grade in [(is_mcqa, lambda idx: grade_mcqa_batch(questions[idx], None, answers[idx], extracted[idx])),
+                        (is_numeric, lambda idx: grade_numeric_batch(None, answers[idx], extracted[idx])),
+                        (is_content, lambda idx: grade_content_batch(None, answers[idx], extracted[idx]))]:
+        if mask.any():
+            correct[mask] = grade(mask)
+    return correct
+
+def batch_grade(category, solutions, answers, questions=None, extracted=None):
+    """
+    Grade whole result columns at once and return a boolean correctness array.
+    Pass a precomputed extract_answer_frame(solutions) as extracted to skip re-parsing.
+    """
+    if category in NUMERIC_CATEGORIES:
+        return grade_numeric_batch(solutions, answers, extracted)
+    elif category == "MMMLU":
+        return grade_mcqa_batch(questions, solutions, answers, extracted)
+    elif category == "KSM":
+        return grade_ksm_batch(questions, solutions, answers, extracted)
+    raise ValueError(f"Unknown category: {category}")
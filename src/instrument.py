@@ -0,0 +1,72 @@
+import sys
+import json
+import time
+import cProfile
+import resource
+from contextlib import contextmanager
+import numpy as np
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its reaped children, in MB"""
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / scale, 1)
+
+def latency_summary(latencies):
+    """p50/p90/p99/max of per-request latencies in seconds"""
+    if not latencies:
+        return {}
+    lat = np.asarray(latencies)
+    return {f"p{q}_s": round(float(np.percentile(lat, q)), 3) for q in (50, 90, 99)} | {"max_s": round(float(lat.max()), 3)}
+
+class StageRecord(dict):
+    """Metrics of one stage run; add() accumulates counters such as token counts while it is open"""
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            self[key] = self.get(key, 0) + value
+
+class RunMetrics:
+    """Wall time, rows/s, token counts and peak RSS per (stage, category) of a run_eval.py run"""
+
+    def __init__(self, **meta):
+        self.meta = meta
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, category=None, rows=None, profile_path=None):
+        record = StageRecord(stage=name, category=category)
+        profiler = cProfile.Profile() if profile_path else None
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profile_path)
+                record["profile"] = profile_path
+            seconds = time.perf_counter() - start
+            record["seconds"] = round(seconds, 3)
+            rows = record.get("rows", rows)
+            if rows is not None:
+                record["rows"] = rows
+                record["rows_per_s"] = round(rows / seconds, 1) if seconds > 0 else None
+            if "completion_tokens" in record:
+                record["completion_tokens_per_s"] = round(record["completion_tokens"] / seconds, 1) if seconds > 0 else None
+            record["peak_rss_mb"] = peak_rss_mb()
+            self.stages.append(record)
+
+    def summary(self):
+        """Total seconds per stage across categories"""
+        totals = {}
+        for record in self.stages:
+            totals[record["stage"]] = round(totals.get(record["stage"], 0) + record["seconds"], 3)
+        return totals
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"meta": self.meta, "stages": self.stages, "totals": self.summary(),
+                       "peak_rss_mb": peak_rss_mb()}, f, indent=4)
@@ -0,0 +1,152 @@
+import sqlite3
+import time
+from collections import OrderedDict
+
+MISSING = object()
+# verdict of a symbolic check that timed out or crashed: counts as incorrect, never cached
+UNRESOLVED = object()
+
+def normalize_expression(expr):
+    return " ".join(str(expr).split())
+
+class PersistentLRU:
+    """Size-bounded in-process LRU in front of an optional size-bounded SQLite table"""
+
+    def __init__(self, name, conn=None, maxsize=100_000, max_rows=2_000_000, flush_every=1000):
+        self.name = name
+        self.conn = conn
+        self.maxsize = maxsize
+        self.max_rows = max_rows
+        self.flush_every = flush_every
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pending = 0
+        if conn is not None:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {name} (key TEXT PRIMARY KEY, value TEXT, used REAL)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name}_used ON {name}(used)")
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        if key in self.memory:
+            self.hits += 1
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.conn is not None:
+            row = self.conn.execute(f"SELECT value FROM {self.name} WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                self.conn.execute(f"UPDATE {self.name} SET used = ? WHERE key = ?", (time.time(), key))
+                self._touch()
+                self._remember(key, row[0])
+                return row[0]
+        self.misses += 1
+        return MISSING
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.conn is not None:
+            self.conn.execute(f"INSERT OR REPLACE INTO {self.name} (key, value, used) VALUES (?, ?, ?)",
+                              (key, value, time.time()))
+            self._touch()
+
+    def _touch(self):
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.conn is None:
+            return
+        excess = self.conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0] - self.max_rows
+        if excess > 0:
+            self.conn.execute(f"DELETE FROM {self.name} WHERE key IN "
+                              f"(SELECT key FROM {self.name} ORDER BY used LIMIT ?)", (excess,))
+            self.evictions += excess
+        self.conn.commit()
+        self._pending = 0
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round((self.hits + self.disk_hits) / lookups * 100, 2) if lookups > 0 else 0,
+        }
+
+class LatexCache:
+    """
+    Memoizes latex_expressions_equal at two levels: the canonical (simplified) form of
+    each expression, and the verdict of each (predicted, gold) pair.
+    """
+
+    def __init__(self, path=None, maxsize=100_000, max_rows=2_000_000):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False) if path else None
+        if self.conn is not None:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.exprs = PersistentLRU("exprs", self.conn, maxsize, max_rows)
+        self.pairs = PersistentLRU("pairs", self.conn, maxsize, max_rows)
+
+    def canonical(self, expr, canonicalize):
+        """Return the cached canonical form of a normalized expression, computing it on a miss"""
+        form = self.exprs.get(expr)
+        if form is MISSING:
+            form = canonicalize(expr)
+            self.exprs.put(expr, form)
+        return form
+
+    def forms(self, exprs):
+        """{normalized expression: canonical form} for the exprs already canonicalized"""
+        found = {}
+        for expr in dict.fromkeys(map(normalize_expression, exprs)):
+            form = self.exprs.get(expr)
+            if form is not MISSING:
+                found[expr] = form
+        return found
+
+    def add_forms(self, forms):
+        for expr, form in forms.items():
+            self.exprs.put(expr, form)
+
+    def _pair_key(self, solution, answer):
+        return normalize_expression(solution) + "\x00" + normalize_expression(answer)
+
+    def lookup(self, solution, answer):
+        """Return the cached verdict for a pair, or MISSING"""
+        verdict = self.pairs.get(self._pair_key(solution, answer))
+        return verdict if verdict is MISSING else bool(int(verdict))
+
+    def store(self, solution, answer, verdict):
+        self.pairs.put(self._pair_key(solution, answer), int(verdict))
+
+    def equal(self, solution, answer, canonicalize):
+        verdict = self.lookup(solution, answer)
+        if verdict is MISSING:
+            form_solution = self.canonical(normalize_expression(solution), canonicalize)
+            form_answer = self.canonical(normalize_expression(answer), canonicalize) if form_solution is not None else None
+            verdict = form_answer is not None and form_solution == form_answer
+            self.store(solution, answer, verdict)
+        return verdict
+
+    def flush(self):
+        self.exprs.flush()
+        self.pairs.flush()
+
+    def close(self):
+        self.flush()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = self.exprs.conn = self.pairs.conn = None
+
+    def stats(self):
+        return {'pairs': self.pairs.stats(), 'exprs': self.exprs.stats()}
@@ -1,14 +1,17 @@
-from vllm import LLM, SamplingParams
-import torch
-
 litellm_models = [
     'gpt-4o',
     'gpt-4o-mini',
     'gpt-4o-mini-2024-07-18'
 ]
-    
-def load_vllm_model(model_name):
+
+def sampling_params(n=1, seed=None):
+    from vllm import SamplingParams
+    return SamplingParams(n=n, seed=seed, temperature=0.8, top_p=0.95, min_tokens=8, max_tokens=2048)
+    # return SamplingParams(temperature=0.0, min_tokens=8, max_tokens=2048)
+
+def load_vllm_model(model_name, n=1, seed=None):
+    # vllm / torch are imported here so API-only and fake-backend runs never load them
+    from vllm import LLM
+    import torch
     llm = LLM(model_name, tensor_parallel_size=torch.cuda.device_count(),max_model_len=8192)
-    params = SamplingParams(temperature=0.8, top_p=0.95, min_tokens=8, max_tokens=2048)
-    # params = SamplingParams(temperature=0.0, min_tokens=8, max_tokens=2048)
-    return llm, params
+    return llm, sampling_params(n, seed)
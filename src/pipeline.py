@@ -0,0 +1,93 @@
+"""
+Streaming generation -> grading for run_eval.py --stream. A producer thread generates
+every category chunk by chunk while chunks already generated are graded on a thread
+pool, so grading of one category overlaps generation of the next and running accuracy
+is known before a category finishes.
+"""
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+_DONE = object()
+
+def stream_generations(jobs, generate, chunk_size, prefetch=2, stage=None):
+    """
+    Yield (category, row_ids, outputs) for every generated chunk of jobs, a list of
+    (category, prompts, row_ids), and (category, None, None) once a category is fully
+    generated. Generation runs in a background thread that stays at most prefetch chunks
+    ahead of the consumer; stage, if given, is RunMetrics.stage and times each category.
+    """
+    chunks = queue.Queue(maxsize=prefetch)
+
+    def produce():
+        try:
+            for category, prompts, row_ids in jobs:
+                with stage("generate", category, rows=len(row_ids)) if stage else nullcontext() as record:
+                    for start in range(0, len(row_ids), chunk_size):
+                        outputs = generate(prompts[start:start + chunk_size], record)
+                        chunks.put((category, row_ids[start:start + chunk_size], outputs))
+                chunks.put((category, None, None))
+            chunks.put(_DONE)
+        except BaseException as e:
+            chunks.put(e)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    while True:
+        item = chunks.get()
+        if item is _DONE:
+            break
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+    producer.join()
+
+class StreamingGrader:
+    """
+    Grades chunks of completions on a pool of threads as they arrive.
+    grade_rows(category, row_ids, outputs) returns one verdict row per row id (an (n,)
+    array per row with n samples each). The symbolic checks it reaches are serialized by
+    grading.py and fan out to the sym_pool processes.
+    """
+
+    def __init__(self, grade_rows, workers=2, report_every=5.0):
+        self.grade_rows = grade_rows
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="grader")
+        self.report_every = report_every
+        self.lock = threading.Lock()
+        self.futures = {}
+        self.verdicts = {}
+        self.counts = {}
+        self.last_report = time.monotonic()
+
+    def submit(self, category, row_ids, outputs):
+        future = self.pool.submit(self._grade, category, list(row_ids), outputs)
+        self.futures.setdefault(category, []).append(future)
+        return future
+
+    def _grade(self, category, row_ids, outputs):
+        verdicts = np.asarray(self.grade_rows(category, row_ids, outputs), dtype=bool).reshape(len(row_ids), -1)
+        with self.lock:
+            self.verdicts.setdefault(category, {}).update(zip(row_ids, verdicts))
+            correct, graded = self.counts.get(category, (0, 0))
+            self.counts[category] = (correct + int(verdicts.sum()), graded + verdicts.size)
+            if time.monotonic() - self.last_report >= self.report_every:
+                self.last_report = time.monotonic()
+                print("running accuracy:", self.running())
+
+    def running(self):
+        """{category: accuracy (%) over what has been graded so far}"""
+        return {k: round(correct / graded * 100, 2) for k, (correct, graded) in self.counts.items() if graded}
+
+    def collect(self, category):
+        """Wait for every submitted chunk of category; returns {row_id: verdicts}"""
+        for future in self.futures.pop(category, []):
+            future.result()
+        with self.lock:
+            return self.verdicts.pop(category, {})
+
+    def close(self):
+        self.pool.shutdown(wait=True)
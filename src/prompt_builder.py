@@ -0,0 +1,86 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+from prompts import prompts
+from data import dataset_fingerprint
+
+system_message = " "
+ORIGINAL_TEXT_PROMPTS = ["en", "oasst_en", "e2e", "e2k"]
+
+@lru_cache(maxsize=None)
+def load_tokenizer(model_name):
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_name)
+
+@lru_cache(maxsize=None)
+def supports_system_role(model_name):
+    """Probe the chat template once instead of catching TemplateError on every row"""
+    from jinja2.exceptions import TemplateError
+    probe = [{"role": "system", "content": system_message}, {"role": "user", "content": "probe"}]
+    try:
+        load_tokenizer(model_name).apply_chat_template(probe, tokenize=False, add_generation_prompt=True)
+        return True
+    except TemplateError as e:
+        if str(e) == 'System role not supported':
+            return False
+        raise
+
+def instruction_for(prompt_id):
+    if prompt_id in ["k2k", "e2k"]:
+        return prompts["ko"]
+    elif prompt_id in ["e2e", "k2e"]:
+        return prompts["en"]
+    return prompts[prompt_id]
+
+def render_queries_local(df, model_name, prompt_id):
+    texts = (df.original if prompt_id in ORIGINAL_TEXT_PROMPTS else df.question).tolist()
+    if 'oasst' in prompt_id:
+        return [prompts[prompt_id].replace("{instruction}", text) for text in texts]
+
+    msg = instruction_for(prompt_id)
+    tokenizer = load_tokenizer(model_name)
+    if supports_system_role(model_name):
+        conversations = [[{"role": "system", "content": system_message},
+                          {"role": "user", "content": " ".join([text, msg])}] for text in texts]
+        return tokenizer.apply_chat_template(conversations, tokenize=False, add_generation_prompt=True)
+    conversations = [[{"role": "user", "content": f"{system_message}" + '\n\n' + text + msg}] for text in texts]
+    return tokenizer.apply_chat_template(conversations, tokenize=False)
+
+def template_fingerprint(model_name, prompt_id):
+    """Hash of everything besides the data that render_queries_local output depends on"""
+    if 'oasst' in prompt_id:
+        parts = [prompts[prompt_id]]
+    else:
+        chat_template = load_tokenizer(model_name).chat_template
+        parts = [system_message, instruction_for(prompt_id), json.dumps(chat_template, sort_keys=True)]
+    return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=8).hexdigest()
+
+def generate_queries_local(df, model_name, prompt_id, cache_dir="prompt_cache"):
+    """
+    Rendered chat-template prompts for df, persisted under cache_dir keyed by
+    (model, prompt_id, dataset fingerprint, template fingerprint) so repeated sweeps skip
+    rendering while edits to prompts.py or the model's chat template invalidate the entry.
+    The fingerprint recorded by dataset_store is reused when df came from there.
+    """
+    if cache_dir is None:
+        return render_queries_local(df, model_name, prompt_id)
+    fingerprint = df.attrs.get("fingerprint") or dataset_fingerprint(df)
+    template = template_fingerprint(model_name, prompt_id)
+    path = os.path.join(cache_dir, model_name.replace('/', '_'), f"{prompt_id}-{fingerprint}-{template}.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    qrys = render_queries_local(df, model_name, prompt_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(qrys, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+    return qrys
+
+def generate_queries_litellm(df, model_name, prompt_id):
+    texts = (df.original if prompt_id == "en" else df.question).tolist()
+    return [[
+        {"role": "system","content": system_message + '\n\n' + prompts[prompt_id]},
+        {"role": "user","content": text}
+    ] for text in texts]
@@ -0,0 +1,95 @@
+import json
+import sqlite3
+import time
+import hashlib
+
+def generation_key(model, prompt, sampling, seed=None):
+    """Content hash of (model id, rendered prompt or chat messages, sampling params, seed)"""
+    payload = json.dumps([model, prompt, sampling, seed], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+class ResponseCache:
+    """
+    Completions persisted in SQLite under generation_key(). Bounded by max_mb of stored
+    text (least recently used rows go first) and optionally by max_age_days since last use.
+    """
+
+    def __init__(self, path, model, sampling, seed=None, max_mb=1024, max_age_days=None, flush_every=1000):
+        self.model = model
+        self.sampling = sampling
+        self.seed = seed
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.flush_every = flush_every
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, bytes INTEGER, used REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses(used)")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pending = 0
+
+    def key(self, prompt):
+        return generation_key(self.model, prompt, self.sampling, self.seed)
+
+    def get_many(self, row_ids, prompts, chunk_size=900):
+        """{row_id: cached completion} for the rows that hit; touches their last-use time"""
+        keys = {}
+        for row_id, prompt in zip(row_ids, prompts):
+            keys.setdefault(self.key(prompt), []).append(row_id)
+        found = {}
+        key_list = list(keys)
+        for i in range(0, len(key_list), chunk_size):
+            chunk = key_list[i:i + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            for key, value in self.conn.execute(
+                    f"SELECT key, value FROM responses WHERE key IN ({placeholders})", chunk):
+                for row_id in keys[key]:
+                    found[row_id] = value
+            self.conn.execute(f"UPDATE responses SET used = ? WHERE key IN ({placeholders})", [time.time(), *chunk])
+        self.conn.commit()
+        self.hits += len(found)
+        self.misses += len(row_ids) - len(found)
+        return found
+
+    def put(self, prompt, value):
+        self.conn.execute("INSERT OR REPLACE INTO responses (key, value, bytes, used) VALUES (?, ?, ?, ?)",
+                          (self.key(prompt), value, len(value.encode("utf-8")), time.time()))
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def put_many(self, prompts, values):
+        for prompt, value in zip(prompts, values):
+            self.put(prompt, value)
+
+    def flush(self):
+        if self.max_age is not None:
+            self.evictions += self.conn.execute("DELETE FROM responses WHERE used < ?",
+                                                (time.time() - self.max_age,)).rowcount
+        total = self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            excess, doomed = total - self.max_bytes, []
+            for key, size in self.conn.execute("SELECT key, bytes FROM responses ORDER BY used"):
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= size
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self.evictions += len(doomed)
+        self.conn.commit()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups * 100, 2) if lookups > 0 else 0,
+        }
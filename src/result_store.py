@@ -0,0 +1,127 @@
+import os
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from grading import GRADER_VERSION
+
+STORE_DIR = os.environ.get("KSM_RESULT_STORE", "results")
+PARTITIONS = ["model", "prompt_id", "category"]
+VERDICT_COLUMNS = ["correct", "grader_version"]
+
+def _dir(root, model, prompt_id, category):
+    return os.path.join(root, f"model={model.replace('/', '_')}", f"prompt_id={prompt_id}", f"category={category}")
+
+class ResultStore:
+    """
+    Generation results as Parquet files partitioned by model / prompt_id / category,
+    zstd-compressed, with a nullable `correct` verdict column and the grader version that
+    produced it. Reads only touch the partitions and columns asked for.
+    """
+
+    def __init__(self, root=STORE_DIR, compression="zstd", compression_level=6):
+        self.root = root
+        self.compression = compression
+        self.compression_level = compression_level
+
+    def path(self, model, prompt_id, category):
+        return os.path.join(_dir(self.root, model, prompt_id, category), "part-0.parquet")
+
+    def exists(self, model, prompt_id, category):
+        return os.path.exists(self.path(model, prompt_id, category))
+
+    def write(self, df, model, prompt_id, category, correct=None):
+        """Replace one partition with df (plus verdicts, if given) atomically"""
+        df = df.drop(columns=[c for c in PARTITIONS + VERDICT_COLUMNS if c in df.columns])
+        df = df.assign(correct=pd.array(correct, dtype="boolean") if correct is not None else pd.NA,
+                       grader_version=GRADER_VERSION if correct is not None else None)
+        df["correct"] = df["correct"].astype("boolean")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        path = self.path(model, prompt_id, category)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(table, path + ".tmp", compression=self.compression,
+                       compression_level=self.compression_level)
+        os.replace(path + ".tmp", path)
+        return path
+
+    def write_verdicts(self, model, prompt_id, category, correct):
+        """Attach grading verdicts to an existing partition"""
+        self.write(self.load(model, prompt_id, category), model, prompt_id, category, correct)
+
+    def dataset(self):
+        return ds.dataset(self.root, format="parquet", partitioning="hive")
+
+    def query(self, columns=None, model=None, prompt_id=None, category=None):
+        """
+        Lazily scan the store: only matching partitions are opened and only `columns`
+        are decoded. model / prompt_id / category may be a value or a list of values.
+        """
+        expr = None
+        for name, value in (("model", model), ("prompt_id", prompt_id), ("category", category)):
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            if name == "model":
+                values = [v.replace('/', '_') for v in values]
+            cond = ds.field(name).isin(values)
+            expr = cond if expr is None else expr & cond
+        return self.dataset().to_table(columns=columns, filter=expr).to_pandas()
+
+    def load(self, model, prompt_id, category, columns=None):
+        """One partition as a DataFrame, without the partition columns"""
+        return pq.read_table(self.path(model, prompt_id, category), columns=columns).to_pandas()
+
+    def scores(self, model=None, prompt_id=None):
+        """Accuracy (%) per model / prompt_id / category from the stored verdicts"""
+        df = self.query(PARTITIONS + ["correct"], model=model, prompt_id=prompt_id)
+        return (df.groupby(PARTITIONS, observed=True).correct.mean() * 100).rename("score").reset_index()
+
+def load_results(spec, columns=None, root=STORE_DIR):
+    """
+    Read a result table given either a legacy CSV path or a store reference
+    "model/prompt_id/category" (the model may itself contain '/'). Requested columns
+    the table does not have are skipped.
+    """
+    if os.path.isfile(spec):
+        return pd.read_csv(spec, usecols=(lambda c: c in columns) if columns is not None else None)
+    model, prompt_id, category = spec.rsplit("/", 2)
+    store = ResultStore(root)
+    if columns is not None:
+        names = pq.read_schema(store.path(model, prompt_id, category)).names
+        columns = [c for c in columns if c in names]
+    return store.load(model, prompt_id, category, columns)
+
+def import_csvs(store, csv_dir, model, prompt_id):
+    """Move run_eval CSVs ({category}.csv under csv_dir) into the store"""
+    imported = []
+    for name in sorted(os.listdir(csv_dir)):
+        if name.endswith(".csv") and not name.endswith("_check.csv"):
+            category = name[:-len(".csv")]
+            store.write(pd.read_csv(os.path.join(csv_dir, name)), model, prompt_id, category)
+            imported.append(category)
+    return imported
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the result store or import legacy result CSVs into it.")
+    parser.add_argument('--root', type=str, default=STORE_DIR, help="Result store directory.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Import {prompt_id}_results/{model}/*.csv")
+    imp.add_argument('--model_name', type=str, required=True)
+    imp.add_argument('--prompt_id', type=str, required=True)
+    imp.add_argument('--csv_dir', type=str, default=None,
+                     help="Defaults to {prompt_id}_results/{model_name with '/' replaced by '_'}.")
+    sc = sub.add_parser("scores", help="Print accuracy per model / prompt_id / category")
+    sc.add_argument('--model_name', type=str, default=None)
+    sc.add_argument('--prompt_id', type=str, default=None)
+    args = parser.parse_args()
+
+    store = ResultStore(args.root)
+    if args.command == "import":
+        csv_dir = args.csv_dir or os.path.join(f"{args.prompt_id}_results", args.model_name.replace('/', '_'))
+        print("imported", import_csvs(store, csv_dir, args.model_name, args.prompt_id))
+    else:
+        print(store.scores(args.model_name, args.prompt_id).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Retry policy shared by the API generation backend (api_backend.py) and the reward-model
+client (rm_client.py), so both retry the same failures with the same backoff.
+"""
+import asyncio
+import random
+
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+RETRYABLE_ERRORS = (asyncio.TimeoutError, OSError)
+
+def is_retryable(error, extra_types=()):
+    """A retryable HTTP status, a timeout or a connection error; extra_types adds client-specific transport errors"""
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS or isinstance(error, RETRYABLE_ERRORS + tuple(extra_types))
+
+def backoff(attempt, base=1.0, cap=60.0):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
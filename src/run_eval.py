@@ -1,12 +1,20 @@
 import os
 import argparse
-from models import load_vllm_model, litellm_models
-from data import generate_queries_local, generate_queries_litellm, parse_boxed_value, answer_in_last_sentence, parse_mcqa_value, parse_ksm_value
-from datasets import load_dataset
-import pandas as pd
-from litellm import batch_completion
+from models import litellm_models
+from backends import make_backend
+from grading import batch_grade, set_symbolic_grader, equivalence_stats, SYMBOLIC_CATEGORIES
+from prompt_builder import generate_queries_local, generate_queries_litellm
+from sym_pool import SymbolicGrader
+from checkpoint import ShardWriter
+from api_backend import generate_api
+from dataset_store import load_category
+from response_cache import ResponseCache
+from result_store import ResultStore, STORE_DIR
+from instrument import RunMetrics, latency_summary
+from sampling import encode_samples, decode_samples, to_long, aggregate_samples
+from pipeline import StreamingGrader, stream_generations
 from tqdm import tqdm
-import huggingface_hub
+import numpy as np
 import json
 
 # Set up argparse
@@ -17,6 +25,54 @@ parser.add_argument('--model_name', type=str, default='gpt-4o',
                     help="Name of the model to use for generating predictions.")
 parser.add_argument('--prompt_id', type=str, default="default",
                     help="Prompt to use for eval.")
+parser.add_argument('--offline', action='store_true',
+                    help="Only use local dataset snapshots; never contact the hub.")
+parser.add_argument('--chunk_size', type=int, default=1024,
+                    help="Rows generated per checkpointed shard.")
+parser.add_argument('--resume', action='store_true',
+                    help="Skip rows (and categories) already finished by a previous run.")
+parser.add_argument('--api_base', type=str, default=None,
+                    help="Override the API endpoint for litellm models (e.g. a local stub server).")
+parser.add_argument('--concurrency', type=int, default=16,
+                    help="Maximum in-flight API requests.")
+parser.add_argument('--rpm', type=int, default=500,
+                    help="API request rate limit per minute.")
+parser.add_argument('--tpm', type=int, default=200000,
+                    help="API token rate limit per minute (prompt + max completion tokens).")
+parser.add_argument('--max_retries', type=int, default=8,
+                    help="Retries per API request on 429s and transient errors.")
+parser.add_argument('--grading_workers', type=int, default=os.cpu_count(),
+                    help="Processes used for symbolic (sympy) answer checks.")
+parser.add_argument('--sympy_timeout', type=float, default=10.0,
+                    help="Seconds before a symbolic check is killed and counted as incorrect.")
+parser.add_argument('--n_samples', '--n-samples', type=int, default=1,
+                    help="Completions sampled per prompt in one generation call; >1 also reports pass@k and majority vote.")
+parser.add_argument('--seed', type=int, default=None,
+                    help="Sampling seed passed to the backend (part of the response cache key).")
+parser.add_argument('--response_cache', type=str, default=None,
+                    help="SQLite file caching completions by (model, prompt, sampling params, seed); off by default.")
+parser.add_argument('--response_cache_mb', type=float, default=1024,
+                    help="Size limit of the response cache; least recently used completions are evicted first.")
+parser.add_argument('--response_cache_max_age_days', type=float, default=None,
+                    help="Also evict cached completions unused for this many days.")
+parser.add_argument('--backend', type=str, default="auto", choices=["auto", "vllm", "api", "server", "fake"],
+                    help="Generation backend: in-process vLLM, litellm API, a running gen_server.py, or the "
+                         "deterministic CPU fake. auto picks api for litellm models and vllm otherwise.")
+parser.add_argument('--server_url', type=str, default="http://127.0.0.1:8100",
+                    help="gen_server.py address for --backend server.")
+parser.add_argument('--fake_p_correct', type=float, default=0.5,
+                    help="Probability a fake-backend completion boxes the gold answer.")
+parser.add_argument('--fake_delay', type=float, default=0.0,
+                    help="Seconds per prompt the fake backend sleeps to simulate generation.")
+parser.add_argument('--result_store', type=str, default=STORE_DIR,
+                    help="Root of the partitioned Parquet result store.")
+parser.add_argument('--stream', action='store_true',
+                    help="Grade chunks as they are generated, overlapping grading with generation of the "
+                         "next chunk and category, and print running accuracy (local backends only).")
+parser.add_argument('--stream_graders', type=int, default=2,
+                    help="Threads grading streamed chunks; symbolic checks still go to the --grading_workers processes.")
+parser.add_argument('--profile_grading', action='store_true',
+                    help="Dump a cProfile of each category's grading stage next to the metrics JSON.")
 
 args = parser.parse_args()
 
@@ -24,49 +80,221 @@ args = parser.parse_args()
 cats = args.cats
 model_name = args.model_name
 prompt_id = args.prompt_id
+model_path = model_name.replace('/','_')
+backend_kind = args.backend
+if backend_kind == "auto":
+    backend_kind = "api" if model_name in litellm_models else "vllm"
+metrics = RunMetrics(model=model_name, prompt_id=prompt_id, n_samples=args.n_samples, cats=cats)
 
 # Load datasets
-dfs = {cat: pd.DataFrame(load_dataset('HAERAE-HUB/HRM8K', cat)['test']) for cat in cats}
+dfs = {}
+for cat in cats:
+    with metrics.stage("load", cat) as record:
+        dfs[cat] = load_category(cat, offline=args.offline)
+        record["rows"] = len(dfs[cat])
 
-# Load model
-if model_name not in litellm_models:
-    llm, params = load_vllm_model(model_name)
+# The symbolic grading pool starts on the first sympy check, as fresh interpreters, so runs
+# that never get there (numeric categories, cached reruns) skip it. With an in-process
+# engine and a category that may need it, fork warm workers now, before the engine exists.
+grader = SymbolicGrader(args.grading_workers, args.sympy_timeout, fork_on_demand=False)
+if backend_kind == "vllm" and any(cat in SYMBOLIC_CATEGORIES for cat in cats):
+    grader.start()
+set_symbolic_grader(grader)
+
+# Load model (or connect to the server holding it)
+if backend_kind != "api":
+    with metrics.stage("model_load"):
+        backend = make_backend(backend_kind, model_name, args.server_url, args.fake_p_correct, args.fake_delay)
 
-model_path = model_name.replace('/','_')
-os.makedirs(f'{prompt_id}_results', exist_ok=True)
 os.makedirs(f'{prompt_id}_results/{model_path}', exist_ok=True)
+store = ResultStore(args.result_store)
+# multi-sample runs live next to, not on top of, the single-sample results
+store_prompt_id = f"{prompt_id}-n{args.n_samples}" if args.n_samples > 1 else prompt_id
+os.makedirs(f"{prompt_id}_json_result", exist_ok=True)
 
-# Process each dataset and generate outputs
-scores = {}
-for k, df in tqdm(dfs.items(),total=len(dfs)):
-    if model_name in litellm_models:
-        prompts = generate_queries_litellm(df, model_name, prompt_id)
-        responses = batch_completion(model=model_name, messages = prompts)
-        outputs = [resp.choices[0].message.content for resp in responses]
+def generate(prompts, record=None):
+    outputs = backend.generate(prompts, args.n_samples, args.seed, record)
+    if args.n_samples > 1:
+        return [encode_samples(samples) for samples in outputs]
+    return [samples[0] for samples in outputs]
+
+def on_api_result(shards, prompts):
+    def on_result(row_id, output):
+        if args.n_samples > 1:
+            output = encode_samples(output)
+        shards.append_one(row_id, output)
+        if cache is not None:
+            cache.put(prompts[row_id], output)
+    return on_result
+
+def on_api_error(shards):
+    def on_error(row_id, message):
+        # an empty completion grades as incorrect; the error column says why
+        output = encode_samples([""] * args.n_samples) if args.n_samples > 1 else ""
+        shards.append_one(row_id, output, error=message)
+    return on_error
+
+def grade(k, df):
+    if k == "KSM" and prompt_id in ["en", "oasst_en", "e2e", "e2k"]:
+        return batch_grade(k, df.solution, df.original_answer, df.original)
+    return batch_grade(k, df.solution, df.answer, df.question)
+
+def gold_answers(k, df):
+    return df.original_answer if k == "KSM" and prompt_id in ["en", "oasst_en", "e2e", "e2k"] else df.answer
+
+api_kwargs = {"api_base": args.api_base} if args.api_base else {}
+if args.seed is not None:
+    api_kwargs["seed"] = args.seed
+
+cache = None
+if args.response_cache:
+    if backend_kind == "api":
+        sampling = {"max_tokens": 2048, "n": args.n_samples, **api_kwargs}
     else:
-        prompts = generate_queries_local(df, model_name, prompt_id)
-        print(prompts[0])
-        outputs = llm.generate(prompts, params)
-        outputs = [output.outputs[0].text.strip("</s2>") for output in outputs]
-    
-    df['solution'] = outputs
-    df.to_csv(f"{prompt_id}_results/{model_path}/{k}.csv", index=False)
-    
-    if k in ["GSM8K", "MATH", "OMNI_MATH"]:
-        score = sum([1 for _,row in df.iterrows() if any([answer_in_last_sentence(row.solution,row.answer),parse_boxed_value(row.solution,row.answer)])])/len(df)*100
-    elif k == "MMMLU":
-        score = sum([1 for _,row in df.iterrows() if any([parse_mcqa_value(row.question,row.solution,row.answer)])])/len(df)*100
-    elif k == "KSM":
-        if prompt_id in ["en", "oasst_en", "e2e", "e2k"]:
-            score = sum([1 for _,row in df.iterrows() if parse_ksm_value(row.original,row.solution,row.original_answer)])/len(df)*100
+        sampling = backend.sampling_key(args.n_samples, args.seed)
+    cache = ResponseCache(args.response_cache, model_name, sampling, args.seed,
+                          args.response_cache_mb, args.response_cache_max_age_days)
+
+def prepare(k, df):
+    """Render prompts and queue up the rows still to generate; cached rows are written (and streamed) right away"""
+    with metrics.stage("render", k, rows=len(df)):
+        if backend_kind in ("api", "fake"):
+            # the fake backend takes chat messages so CPU runs need no tokenizer
+            prompts = generate_queries_litellm(df, model_name, prompt_id)
         else:
-            score = sum([1 for _,row in df.iterrows() if parse_ksm_value(row.question,row.solution,row.answer)])/len(df)*100
+            prompts = generate_queries_local(df, model_name, prompt_id)
+            print(prompts[0])
+    if backend_kind == "fake":
+        backend.expect(prompts, gold_answers(k, df))
+
+    shards = ShardWriter(f"{prompt_id}_results/{model_path}/{k}_shards")
+    if not args.resume:
+        shards.reset()
+    # rows a previous run recorded as failed are retried
+    finished = shards.finished() - set(shards.errors())
+    todo = [i for i in range(len(df)) if i not in finished]
+    if cache is not None and todo:
+        hits = cache.get_many(todo, [prompts[i] for i in todo])
+        if hits:
+            shards.append(list(hits), list(hits.values()))
+            if stream_grader is not None:
+                stream_grader.submit(k, list(hits), list(hits.values()))
+        todo = [i for i in todo if i not in hits]
+    return prompts, shards, todo
+
+def save_chunk(shards, prompts, row_ids, outputs):
+    shards.append(row_ids, outputs)
+    if cache is not None:
+        cache.put_many([prompts[i] for i in row_ids], outputs)
+
+def assemble(k, df, shards):
+    """Full result table of a generated category (long format for n > 1); the shards stay until finish stores it"""
+    outputs = shards.assemble(len(df))
+    errors = shards.errors()
+    if errors:
+        print(f"{k}: {len(errors)} rows failed to generate; stored with empty solutions (graded incorrect)")
+        df = df.assign(error=[errors.get(i) for i in range(len(df))])
+    if args.n_samples > 1:
+        # long format: one row per (row_id, sample_id)
+        result = to_long(df, decode_samples(outputs))
+    else:
+        result = df.assign(solution=outputs)
+    return result, outputs
+
+def grade_rows(k, row_ids, outputs):
+    """Verdicts of one chunk of rows, shaped (rows, n_samples)"""
+    rows = dfs[k].iloc[list(row_ids)]
+    if args.n_samples > 1:
+        rows = to_long(rows, decode_samples(outputs))
+    else:
+        rows = rows.assign(solution=list(outputs))
+    return grade(k, rows).reshape(len(row_ids), -1)
+
+def finish(k, df, correct, shards=None):
+    """Store the graded partition once; the category's shards are only dropped after that"""
+    store.write(df, model_name, store_prompt_id, k, correct)
+    if shards is not None:
+        shards.remove()
+    if args.n_samples > 1:
+        sample_metrics[k] = aggregate_samples(df, correct)
+        print(k, sample_metrics[k])
+    score = correct.mean()*100
     scores[k] = score
     print(scores)
-  
-os.makedirs(f"{prompt_id}_json_result", exist_ok=True)
+
+# Process each dataset and generate outputs
+scores = {}
+sample_metrics = {}
+stream_grader = None
+if args.stream and backend_kind != "api":
+    # generation runs ahead in a background thread; chunks are graded as they arrive
+    stream_grader = StreamingGrader(grade_rows, args.stream_graders)
+    jobs, pending = [], {}
+    for k, df in dfs.items():
+        if args.resume and store.exists(model_name, store_prompt_id, k):
+            continue
+        prompts, shards, todo = prepare(k, df)
+        jobs.append((k, [prompts[i] for i in todo], todo))
+        pending[k] = (prompts, shards)
+    for k, row_ids, outputs in stream_generations(jobs, generate, args.chunk_size, stage=metrics.stage):
+        prompts, shards = pending[k]
+        if row_ids is not None:
+            save_chunk(shards, prompts, row_ids, outputs)
+            stream_grader.submit(k, row_ids, outputs)
+            continue
+        df, outputs = assemble(k, dfs[k], shards)
+        # only the tail of grading left once generation of the category is done
+        with metrics.stage("grade_wait", k, rows=len(df)):
+            verdicts = stream_grader.collect(k)
+            missing = [i for i in range(len(dfs[k])) if i not in verdicts]
+            if missing:  # finished by a previous --resume run
+                verdicts.update(zip(missing, grade_rows(k, missing, [outputs[i] for i in missing])))
+            correct = np.concatenate([verdicts[i] for i in range(len(dfs[k]))])
+        finish(k, df, correct, shards)
+    stream_grader.close()
+
+for k, df in tqdm(dfs.items(),total=len(dfs)):
+    if k in scores:
+        continue
+    shards = None
+    if args.resume and store.exists(model_name, store_prompt_id, k):
+        df = store.load(model_name, store_prompt_id, k)
+    else:
+        prompts, shards, todo = prepare(k, df)
+        with metrics.stage("generate", k, rows=len(todo)) as record:
+            if backend_kind == "api":
+                stats = generate_api(model_name, [prompts[i] for i in todo], todo, on_api_result(shards, prompts),
+                                     concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm,
+                                     on_error=on_api_error(shards), max_retries=args.max_retries, n=args.n_samples, **api_kwargs)
+                latencies = stats.pop("latencies")
+                record.update(stats, latency=latency_summary(latencies))
+                print(k, stats)
+            else:
+                for start in range(0, len(todo), args.chunk_size):
+                    row_ids = todo[start:start + args.chunk_size]
+                    save_chunk(shards, prompts, row_ids, generate([prompts[i] for i in row_ids], record))
+        df, _ = assemble(k, df, shards)
+
+    profile_path = f"{prompt_id}_json_result/{model_path}_{k}_grading.prof" if args.profile_grading else None
+    with metrics.stage("grade", k, rows=len(df), profile_path=profile_path):
+        correct = grade(k, df)
+    finish(k, df, correct, shards)
+
+grader.close()
+if backend_kind != "api":
+    backend.close()
+if cache is not None:
+    cache.close()
+    metrics.meta["response_cache"] = cache.stats()
+    print("response cache:", cache.stats())
 with open(f"{prompt_id}_json_result/{model_path}.json", "w") as f:
     json.dump(scores, f, indent=4)
+metrics.meta["equivalence_tiers"] = equivalence_stats()
+metrics.save(f"{prompt_id}_json_result/{model_path}_metrics.json")
+print("stage seconds:", metrics.summary())
+if sample_metrics:
+    with open(f"{prompt_id}_json_result/{model_path}_samples.json", "w") as f:
+        json.dump(sample_metrics, f, indent=4)
 
 print(f'########### {model_name} ###########')
 for k,v in scores.items():
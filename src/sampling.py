@@ -0,0 +1,72 @@
+import json
+from math import comb
+import numpy as np
+import pandas as pd
+from grading import extract_answer
+
+def to_long(df, outputs):
+    """One row per (row_id, sample_id) from a list of n completions per dataset row"""
+    n = len(outputs[0]) if outputs else 0
+    long_df = df.loc[df.index.repeat(n)].reset_index(drop=True)
+    long_df.insert(0, "sample_id", np.tile(np.arange(n), len(df)))
+    long_df.insert(0, "row_id", np.repeat(np.arange(len(df)), n))
+    long_df["solution"] = [text for samples in outputs for text in samples]
+    return long_df
+
+def encode_samples(samples):
+    return json.dumps(samples, ensure_ascii=False)
+
+def decode_samples(solutions):
+    return [json.loads(s) for s in solutions]
+
+def predicted_answers(solutions):
+    """The answer each completion commits to: its first boxed content, else the last number of its last line"""
+    keys = []
+    for text in solutions:
+        record = extract_answer(text)
+        if record.boxed:
+            keys.append(record.boxed[0].strip())
+        elif record.last_numbers:
+            keys.append(repr(record.last_numbers[-1]))
+        else:
+            keys.append(None)
+    return keys
+
+def pass_at_k(verdicts, k):
+    """Unbiased pass@k (Chen et al., 2021) per row of an (n_rows, n) verdict matrix"""
+    n = verdicts.shape[1]
+    table = np.array([1.0 - comb(n - c, k) / comb(n, k) for c in range(n + 1)])
+    return table[verdicts.sum(axis=1)]
+
+def majority_vote(verdicts, answer_codes):
+    """
+    Whether each row's most common predicted answer is correct. answer_codes is an
+    (n_rows, n) integer matrix with -1 for samples that committed to no answer; ties go
+    to the earliest sample.
+    """
+    agree = answer_codes[:, :, None] == answer_codes[:, None, :]
+    votes = np.where(answer_codes >= 0, agree.sum(axis=2), -1)
+    winner = votes.argmax(axis=1)
+    rows = np.arange(len(verdicts))
+    return verdicts[rows, winner] & (votes[rows, winner] > 0)
+
+def default_ks(n):
+    """1, 2, 4, ... up to n, plus n itself"""
+    ks = [1 << i for i in range(n.bit_length()) if 1 << i <= n]
+    return ks + [n] if n > 1 and ks[-1] != n else ks
+
+def aggregate_samples(long_df, correct, ks=None):
+    """
+    pass@1, unbiased pass@k and majority-vote accuracy (percentages) from a long-format
+    table; ks defaults to default_ks(n) for n samples per row
+    """
+    n_rows = long_df.row_id.nunique()
+    verdicts = np.asarray(correct, dtype=bool).reshape(n_rows, -1)
+    n = verdicts.shape[1]
+    codes, _ = pd.factorize(pd.Series(predicted_answers(long_df.solution), dtype=object), use_na_sentinel=True)
+    metrics = {"n_samples": n}
+    for k in (ks if ks is not None else default_ks(n)):
+        if k <= n:
+            metrics[f"pass@{k}"] = round(float(pass_at_k(verdicts.astype(int), k).mean() * 100), 2)
+    metrics["majority_vote"] = round(float(majority_vote(verdicts, codes.reshape(n_rows, n)).mean() * 100), 2)
+    return metrics
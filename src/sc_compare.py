@@ -1,198 +1,197 @@
+import os
 import pandas as pd
+import numpy as np
 import json
 import argparse
-from sc_stats import check_correct
-
-def process_solutions(df, no_retry_only=False):
-    """Process solutions and create output list"""
-    retry_n = 0
-    no_retry_n = 0
-    output = []
-    
-    for _, row in df.iterrows():
-        initial_is_correct = False
-        retry_is_correct = False
-        no_retry_is_correct = False
-        
-        if not no_retry_only and 'Hmm' in row.solution:
-            splits = row.solution.split('Hmm')
-            initial, retry = splits[0], splits[1]
-            retry_n += 1
-            if check_correct(initial, row.answer):
-                initial_is_correct = True
-            if check_correct(retry, row.answer):
-                retry_is_correct = True
-            no_retry_is_correct = None
-        else:
-            no_retry = row.solution
-            if check_correct(no_retry, row.answer):
-                no_retry_is_correct = True
-            initial_is_correct = None
-            retry_is_correct = None
-            no_retry_n += 1
-            
-        output.append([initial_is_correct, retry_is_correct, no_retry_is_correct])
-    
-    return output, retry_n, no_retry_n
-
-def calculate_metrics(output):
-    """Calculate accuracy metrics"""
-    total_samples = len(output)
-    total_correct = 0
-    retry_correct = 0
-    retry_wrong = 0
-    retry_total = 0
-    no_retry_correct = 0
-    no_retry_total = 0
-    
-    for initial, retry, no_retry in output:
-        # Case 1: Solution with retry
-        if retry is not None:  # This means it was a retry case
-            retry_total += 1
-            if retry:  # If retry was correct
-                total_correct += 1
-                retry_correct += 1
-            else:
-                retry_wrong += 1
-                
-        # Case 2: Solution without retry
-        else:  # This means it was a no_retry case
-            no_retry_total += 1
-            if no_retry:  # If the single attempt was correct
-                total_correct += 1
-                no_retry_correct += 1
-    
-    # Calculate metrics
-    total_accuracy = (total_correct / total_samples) * 100
-    retry_accuracy = (retry_correct / retry_total) * 100 if retry_total > 0 else 0
-    no_retry_accuracy = (no_retry_correct / no_retry_total) * 100 if no_retry_total > 0 else 0
-    
-    # Calculate retry success rate
-    retry_success_rate = (retry_correct / retry_total) * 100 if retry_total > 0 else 0
-    retry_failure_rate = (retry_wrong / retry_total) * 100 if retry_total > 0 else 0
-    
-    return {
-        'total_accuracy': round(total_accuracy, 2),
-        'retry_accuracy': round(retry_accuracy, 2),
-        'no_retry_accuracy': round(no_retry_accuracy, 2),
-        'retry_success_rate': round(retry_success_rate, 2),
-        'retry_failure_rate': round(retry_failure_rate, 2),
-        'counts': {
-            'total_samples': total_samples,
-            'retry_total': retry_total,
-            'no_retry_total': no_retry_total,
-            'retry_correct': retry_correct,
-            'retry_wrong': retry_wrong
-        }
+from grading import grade_numeric_batch
+from sc_stats import split_retries
+from verdict_store import VerdictStore, grade_incremental
+from result_store import load_results
+
+def row_keys(df, key):
+    """Alignment key per row: the key column (numbered when it repeats), else the row position"""
+    if key in df.columns:
+        base = df[key].astype(str)
+        return base + "\x1f" + base.groupby(base).cumcount().astype(str)
+    return pd.Series(np.arange(len(df)).astype(str), index=df.index)
+
+def segment(frames, key="question"):
+    """
+    One row per (model, key) with the attempt texts every metric needs: the initial attempt,
+    the first retry (after 'Hmm') and the whole solution.
+    """
+    rows = []
+    for model, df in frames.items():
+        has_retry, initial, retry = split_retries(df.solution.reset_index(drop=True))
+        rows.append(pd.DataFrame({
+            "model": model,
+            "key": row_keys(df, key).to_numpy(),
+            "answer": df.answer.to_numpy(),
+            "has_retry": has_retry,
+            "initial": initial.to_numpy(),
+            "retry": retry.to_numpy(),
+            "whole": df.solution.astype(str).to_numpy(),
+        }))
+    return pd.concat(rows, ignore_index=True)
+
+def grade_attempts(rows, store=None):
+    """
+    Grade every distinct (attempt text, answer) pair once and add initial_correct,
+    retry_correct and whole_correct columns. Attempts that do not exist are False.
+    """
+    answers = rows.answer.astype(str)
+    texts = {
+        "initial": rows.initial,
+        "retry": rows.retry.where(rows.has_retry),
+        "whole": rows.whole.where(rows.has_retry, rows.initial),
     }
+    pairs = pd.concat([pd.DataFrame({"text": t, "answer": answers}) for t in texts.values()], ignore_index=True)
+    pairs["text"] = pairs.text.fillna("\x00")
+    codes, _ = pd.factorize(pairs.text + "\x1f" + pairs.answer)
+    uniques = pairs.iloc[np.unique(codes, return_index=True)[1]].reset_index(drop=True)
+    if store is not None:
+        verdicts, _ = grade_incremental(store, "GSM8K", uniques.text, uniques.answer, uniques.text)
+    else:
+        verdicts = grade_numeric_batch(uniques.text, uniques.answer)
+    verdicts = verdicts & (uniques.text != "\x00").to_numpy()
+    graded = verdicts[codes].reshape(len(texts), len(rows))
+    rows = rows.copy()
+    for i, name in enumerate(texts):
+        rows[f"{name}_correct"] = graded[i]
+    rows["final_correct"] = np.where(rows.has_retry, rows.retry_correct, rows.initial_correct)
+    return rows
+
+def _pct(num, den):
+    return (num / den * 100).where(den > 0, 0).round(2)
+
+def model_metrics(rows):
+    """Per-model accuracy with and without retries, computed with one groupby"""
+    g = rows.assign(
+        retry_correct_n=rows.has_retry & rows.retry_correct,
+        retry_wrong_n=rows.has_retry & ~rows.retry_correct,
+        no_retry_correct_n=~rows.has_retry & rows.initial_correct,
+    ).groupby("model", sort=False).agg(
+        total_samples=("key", "size"),
+        retry_total=("has_retry", "sum"),
+        total_correct=("final_correct", "sum"),
+        whole_correct=("whole_correct", "sum"),
+        retry_correct=("retry_correct_n", "sum"),
+        retry_wrong=("retry_wrong_n", "sum"),
+        no_retry_correct=("no_retry_correct_n", "sum"),
+    )
+    g["no_retry_total"] = g.total_samples - g.retry_total
+    table = pd.DataFrame({
+        "total_accuracy": _pct(g.total_correct, g.total_samples),
+        "single_attempt_accuracy": _pct(g.whole_correct, g.total_samples),
+        "retry_accuracy": _pct(g.retry_correct, g.retry_total),
+        "no_retry_accuracy": _pct(g.no_retry_correct, g.no_retry_total),
+        "retry_success_rate": _pct(g.retry_correct, g.retry_total),
+        "retry_failure_rate": _pct(g.retry_wrong, g.retry_total),
+    })
+    counts = g[["total_samples", "retry_total", "no_retry_total", "retry_correct", "retry_wrong"]].astype(int)
+    return {model: {**table.loc[model].to_dict(), "counts": counts.loc[model].to_dict()} for model in g.index}
+
+def retry_patterns(rows):
+    """
+    Every ordered (new, base) model pair at once: rows aligned by key, crossing the base
+    model's single-attempt verdict with whether the new model retried and whether the retry
+    was correct.
+    """
+    cols = ["key", "model", "has_retry", "retry_correct", "whole_correct"]
+    pairs = rows[cols].merge(rows[cols], on="key", suffixes=("_new", "_base"))
+    pairs = pairs[pairs.model_new != pairs.model_base]
+    table = pd.crosstab(
+        [pairs.model_new, pairs.model_base, pairs.whole_correct_base],
+        [pairs.has_retry_new, pairs.retry_correct_new],
+    )
+    full_columns = pd.MultiIndex.from_product([[False, True], [False, True]])
+    table = table.reindex(columns=full_columns, fill_value=0)
+    table = table.unstack("whole_correct_base", fill_value=0)
+    table.columns = table.columns.set_names(["retried", "retry_correct", "base_correct"])
+
+    def count(retried=None, retry_correct=None, base_correct=None):
+        sel = pd.Series(True, index=table.columns)
+        for name, value in (("retried", retried), ("retry_correct", retry_correct), ("base_correct", base_correct)):
+            if value is not None:
+                sel &= table.columns.get_level_values(name) == value
+        return table.loc[:, sel.to_numpy()].sum(axis=1)
 
-def compare_solutions(df_new, df_base):
-    """Compare solutions between new model (with retries) and base model"""
-    retry_on_correct = 0
-    retry_on_wrong = 0
-    total_correct_base = 0
-    total_wrong_base = 0
-    
-    success_after_retry_when_base_wrong = 0
-    success_after_retry_when_base_correct = 0
-    
-    for (_, row_new), (_, row_base) in zip(df_new.iterrows(), df_base.iterrows()):
-        # Check base model correctness
-        base_correct = check_correct(row_base.solution, row_base.answer)
-        
-        if base_correct:
-            total_correct_base += 1
-        else:
-            total_wrong_base += 1
-            
-        # Check if new model retries
-        if 'Hmm' in row_new.solution:
-            splits = row_new.solution.split('Hmm')
-            initial, retry = splits[0], splits[1]
-            
-            if base_correct:
-                retry_on_correct += 1
-                if check_correct(retry, row_new.answer):
-                    success_after_retry_when_base_correct += 1
-            else:
-                retry_on_wrong += 1
-                if check_correct(retry, row_new.answer):
-                    success_after_retry_when_base_wrong += 1
-    
-    # Calculate percentages
-    retry_rate_on_correct = (retry_on_correct / total_correct_base * 100) if total_correct_base > 0 else 0
-    retry_rate_on_wrong = (retry_on_wrong / total_wrong_base * 100) if total_wrong_base > 0 else 0
-    
-    success_rate_after_retry_base_wrong = (success_after_retry_when_base_wrong / retry_on_wrong * 100) if retry_on_wrong > 0 else 0
-    success_rate_after_retry_base_correct = (success_after_retry_when_base_correct / retry_on_correct * 100) if retry_on_correct > 0 else 0
-    
+    counts = pd.DataFrame({
+        "aligned_rows": count(),
+        "total_correct_base": count(base_correct=True),
+        "total_wrong_base": count(base_correct=False),
+        "retry_on_correct": count(retried=True, base_correct=True),
+        "retry_on_wrong": count(retried=True, base_correct=False),
+        "success_after_retry_when_base_wrong": count(retried=True, retry_correct=True, base_correct=False),
+        "success_after_retry_when_base_correct": count(retried=True, retry_correct=True, base_correct=True),
+    }).astype(int)
+    patterns = pd.DataFrame({
+        "retry_rate_when_base_correct": _pct(counts.retry_on_correct, counts.total_correct_base),
+        "retry_rate_when_base_wrong": _pct(counts.retry_on_wrong, counts.total_wrong_base),
+        "success_rate_after_retry_base_wrong": _pct(counts.success_after_retry_when_base_wrong, counts.retry_on_wrong),
+        "success_rate_after_retry_base_correct": _pct(counts.success_after_retry_when_base_correct, counts.retry_on_correct),
+    })
     return {
-        'retry_patterns': {
-            'retry_rate_when_base_correct': round(retry_rate_on_correct, 2),
-            'retry_rate_when_base_wrong': round(retry_rate_on_wrong, 2),
-            'success_rate_after_retry_base_wrong': round(success_rate_after_retry_base_wrong, 2),
-            'success_rate_after_retry_base_correct': round(success_rate_after_retry_base_correct, 2)
-        },
-        'counts': {
-            'total_correct_base': total_correct_base,
-            'total_wrong_base': total_wrong_base,
-            'retry_on_correct': retry_on_correct,
-            'retry_on_wrong': retry_on_wrong,
-            'success_after_retry_when_base_wrong': success_after_retry_when_base_wrong,
-            'success_after_retry_when_base_correct': success_after_retry_when_base_correct
-        }
+        f"{new} vs {base}": {"new_model": new, "base_model": base,
+                             "retry_patterns": patterns.loc[(new, base)].to_dict(),
+                             "counts": counts.loc[(new, base)].to_dict()}
+        for new, base in counts.index
     }
 
+def compare_models(frames, key="question", store=None):
+    """Segment and grade every model's attempts once, then derive all metrics and pairwise tables"""
+    rows = grade_attempts(segment(frames, key), store)
+    return {"models": model_metrics(rows), "comparisons": retry_patterns(rows)}
+
+def model_names(paths):
+    """File stems, falling back to full paths when two stems collide"""
+    stems = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    return stems if len(set(stems)) == len(stems) else list(paths)
+
 def main():
-    parser = argparse.ArgumentParser(description='Compare solution accuracy between models')
-    parser.add_argument('new_model_file', type=str, help='Path to CSV file with retry capability')
-    parser.add_argument('base_model_file', type=str, help='Path to CSV file without retries')
+    parser = argparse.ArgumentParser(description='Compare self-correction behaviour across any number of models')
+    parser.add_argument('model_files', type=str, nargs='+',
+                        help='Results to compare, as result store references "model/prompt_id/category" '
+                             'or CSV paths (e.g. new model with retries, then base model)')
     parser.add_argument('output_file', type=str, help='Path for output JSON file')
+    parser.add_argument('--key', type=str, default='question',
+                        help='Column used to align rows across files (row position if missing)')
+    parser.add_argument('--verdict_cache', type=str, default=None,
+                        help='SQLite file persisting attempt verdicts across runs')
     args = parser.parse_args()
-    
+    if len(args.model_files) < 2:
+        parser.error("need at least two model files")
+
     try:
-        df_new = pd.read_csv(args.new_model_file)
-        df_base = pd.read_csv(args.base_model_file)
+        frames = {name: load_results(path, columns=["solution", "answer", args.key])
+                  for name, path in zip(model_names(args.model_files), args.model_files)}
     except FileNotFoundError as e:
         print(f"Error: Input file not found - {str(e)}")
         return
     except Exception as e:
         print(f"Error reading input files: {str(e)}")
         return
-    
-    # Process solutions for both models
-    new_output, new_retry_n, new_no_retry_n = process_solutions(df_new)
-    base_output, _, _ = process_solutions(df_base, no_retry_only=True)
-    
-    # Calculate metrics for both models
-    new_metrics = calculate_metrics(new_output)
-    base_metrics = calculate_metrics(base_output)
-    
-    # Compare solutions
-    comparison_metrics = compare_solutions(df_new, df_base)
-    
-    # Combine all metrics
-    all_metrics = {
-        'new_model': new_metrics,
-        'base_model': base_metrics,
-        'comparison': comparison_metrics
-    }
-    
-    # Print results
-    print("Base Model Metrics:")
-    print(f"Accuracy: {base_metrics['total_accuracy']}%")
-    
-    print("\nNew Model Metrics:")
-    print(f"Overall Accuracy: {new_metrics['total_accuracy']}%")
-    print(f"Retry Accuracy: {new_metrics['retry_accuracy']}%")
-    print(f"No Retry Accuracy: {new_metrics['no_retry_accuracy']}%")
-    
-    print("\nRetry Patterns:")
-    print(f"Retry rate when base was correct: {comparison_metrics['retry_patterns']['retry_rate_when_base_correct']}%")
-    print(f"Retry rate when base was wrong: {comparison_metrics['retry_patterns']['retry_rate_when_base_wrong']}%")
-    print(f"Success rate after retry (when base was wrong): {comparison_metrics['retry_patterns']['success_rate_after_retry_base_wrong']}%")
-    print(f"Success rate after retry (when base was correct): {comparison_metrics['retry_patterns']['success_rate_after_retry_base_correct']}%")
-    
+
+    store = VerdictStore(args.verdict_cache) if args.verdict_cache else None
+    all_metrics = compare_models(frames, args.key, store)
+    if store is not None:
+        store.close()
+
+    for name, metrics in all_metrics["models"].items():
+        print(f"{name}:")
+        print(f"  Overall Accuracy: {metrics['total_accuracy']}%")
+        print(f"  Single Attempt Accuracy: {metrics['single_attempt_accuracy']}%")
+        print(f"  Retry Accuracy: {metrics['retry_accuracy']}%")
+        print(f"  No Retry Accuracy: {metrics['no_retry_accuracy']}%")
+
+    for name, comparison in all_metrics["comparisons"].items():
+        patterns = comparison['retry_patterns']
+        print(f"\nRetry Patterns ({name}):")
+        print(f"Retry rate when base was correct: {patterns['retry_rate_when_base_correct']}%")
+        print(f"Retry rate when base was wrong: {patterns['retry_rate_when_base_wrong']}%")
+        print(f"Success rate after retry (when base was wrong): {patterns['success_rate_after_retry_base_wrong']}%")
+        print(f"Success rate after retry (when base was correct): {patterns['success_rate_after_retry_base_correct']}%")
+
     # Save results
     try:
         with open(args.output_file, 'w') as f:
@@ -1,7 +1,8 @@
-import pandas as pd
+import numpy as np
 import json
 import argparse
-from data import answer_in_last_sentence, parse_boxed_value
+from result_store import load_results
+from grading import answer_in_last_sentence, parse_boxed_value, grade_numeric_batch
 
 def check_correct(solution, answer):
     if any([answer_in_last_sentence(solution,answer),parse_boxed_value(solution,answer)]):
@@ -9,37 +10,34 @@ def check_correct(solution, answer):
     else:
         return False
 
+def split_retries(solutions):
+    """Split solutions on 'Hmm' into (has_retry, initial attempt, first retry) columns"""
+    solutions = solutions.astype(str)
+    splits = solutions.str.split('Hmm')
+    has_retry = solutions.str.contains('Hmm', regex=False).to_numpy(dtype=bool)
+    return has_retry, splits.str[0], splits.str[1].fillna('')
+
+def build_output(has_retry, initial_correct, retry_correct, no_retry_correct):
+    """Pack per-row verdicts into [initial_is_correct, retry_is_correct, no_retry_is_correct]"""
+    return [[bool(i), bool(r), None] if h else [None, None, bool(n)]
+            for h, i, r, n in zip(has_retry, initial_correct, retry_correct, no_retry_correct)]
+
+def grade_where(mask, solutions, answers):
+    """Grade only the rows selected by mask; unselected rows are False"""
+    correct = np.zeros(len(mask), dtype=bool)
+    if mask.any():
+        correct[mask] = grade_numeric_batch(solutions[mask], answers[mask])
+    return correct
+
 def process_solutions(df):
     """Process solutions and create output list"""
-    retry_n = 0
-    no_retry_n = 0
-    output = []
-    
-    for _, row in df.iterrows():
-        initial_is_correct = False
-        retry_is_correct = False
-        no_retry_is_correct = False
-        
-        if 'Hmm' in row.solution:
-            splits = row.solution.split('Hmm')
-            initial, retry = splits[0], splits[1]
-            retry_n += 1
-            if check_correct(initial, row.answer):
-                initial_is_correct = True
-            if check_correct(retry, row.answer):
-                retry_is_correct = True
-            no_retry_is_correct = None
-        else:
-            no_retry = row.solution
-            if check_correct(no_retry, row.answer):
-                no_retry_is_correct = True
-            initial_is_correct = None
-            retry_is_correct = None
-            no_retry_n += 1
-            
-        output.append([initial_is_correct, retry_is_correct, no_retry_is_correct])
-    
-    return output, retry_n, no_retry_n
+    has_retry, initial, retry = split_retries(df.solution)
+    initial_correct = grade_where(has_retry, initial, df.answer)
+    retry_correct = grade_where(has_retry, retry, df.answer)
+    no_retry_correct = grade_where(~has_retry, df.solution, df.answer)
+    output = build_output(has_retry, initial_correct, retry_correct, no_retry_correct)
+    retry_n = int(has_retry.sum())
+    return output, retry_n, len(df) - retry_n
 
 def calculate_metrics(output):
     """
@@ -123,13 +121,14 @@ def calculate_metrics(output):
 def main():
     # Set up argument parser
     parser = argparse.ArgumentParser(description='Analyze solution accuracy with retries')
-    parser.add_argument('input_file', type=str, help='Path to input CSV file')
+    parser.add_argument('input_file', type=str,
+                        help='Result store reference "model/prompt_id/category" or path to a CSV file')
     parser.add_argument('output_file', type=str, help='Path for output JSON file')
     args = parser.parse_args()
     
     # Read DataFrame
     try:
-        df = pd.read_csv(args.input_file)
+        df = load_results(args.input_file, columns=["solution", "answer"])
     except FileNotFoundError:
         print(f"Error: Input file '{args.input_file}' not found")
         return
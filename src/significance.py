@@ -0,0 +1,160 @@
+import json
+import argparse
+import logging
+from itertools import combinations
+from math import lgamma, log
+import numpy as np
+import pandas as pd
+from result_store import ResultStore, STORE_DIR
+
+logger = logging.getLogger(__name__)
+
+def verdict_matrix(store, prompt_id, categories, models=None):
+    """
+    (model names, (n_models, n_rows) bool matrix) of stored verdicts over the given
+    categories, rows concatenated in category order. Models missing a category or with
+    a different row count are dropped with a warning.
+    """
+    df = store.query(["model", "category", "correct"], model=models, prompt_id=prompt_id, category=categories)
+    if df.empty:
+        return [], np.zeros((0, 0), dtype=bool)
+    sizes = df.groupby(["model", "category"], observed=True).size().unstack("category")
+    expected = sizes.mode().iloc[0]
+    keep = [m for m in sizes.index if sizes.loc[m].equals(expected)]
+    for m in sorted(set(sizes.index) - set(keep)):
+        logger.warning("dropping %s: rows per category %s != %s", m, sizes.loc[m].to_dict(), expected.to_dict())
+    rows = []
+    for model in keep:
+        part = df[df.model == model]
+        rows.append(np.concatenate([part[part.category == c].correct.fillna(False).to_numpy(dtype=bool)
+                                    for c in categories if c in expected.index]))
+    return keep, np.array(rows, dtype=bool).reshape(len(keep), -1)
+
+def resample_weights(n_rows, n_resamples, seed=0, chunk_size=1000):
+    """
+    Yield (chunk, n_rows) bootstrap count matrices: how often each row is drawn in each
+    resample. Every model is scored against the same draws, which keeps differences paired.
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_resamples, chunk_size):
+        size = min(chunk_size, n_resamples - start)
+        idx = rng.integers(0, n_rows, size=(size, n_rows)) + np.arange(size)[:, None] * n_rows
+        yield np.bincount(idx.ravel(), minlength=size * n_rows).reshape(size, n_rows).astype(np.float32)
+
+def bootstrap_means(verdicts, n_resamples=10_000, seed=0, chunk_size=1000):
+    """(n_resamples, n_models) accuracy of every model on every bootstrap resample"""
+    n_rows = verdicts.shape[1]
+    values = verdicts.T.astype(np.float32)
+    return np.concatenate([w @ values for w in resample_weights(n_rows, n_resamples, seed, chunk_size)]) / n_rows
+
+def percentile_interval(samples, alpha=0.05, axis=0):
+    return np.percentile(samples, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=axis)
+
+def _binom_two_sided(k, n):
+    """Exact two-sided binomial test p-value for k successes in n trials at p = 0.5"""
+    if n == 0:
+        return 1.0
+    ks = np.arange(0, min(k, n - k) + 1)
+    log_pmf = np.array([lgamma(n + 1) - lgamma(i + 1) - lgamma(n - i + 1) for i in ks]) - n * log(2)
+    return float(min(1.0, 2 * np.exp(log_pmf).sum()))
+
+def mcnemar(a, b):
+    """Exact McNemar test on paired verdicts; returns (a right & b wrong, a wrong & b right, p-value)"""
+    only_a = int((a & ~b).sum())
+    only_b = int((~a & b).sum())
+    return only_a, only_b, _binom_two_sided(min(only_a, only_b), only_a + only_b)
+
+def permutation_pvalues(verdicts, pairs, n_permutations=10_000, seed=0, chunk_size=1000):
+    """
+    Paired sign-flip permutation p-values of mean(a) - mean(b) for every (a, b) index pair.
+    One random sign matrix per chunk is shared by all pairs, so each chunk is a single
+    (chunk, n_rows) @ (n_rows, n_pairs) product; concordant rows have zero difference and
+    drop out on their own.
+    """
+    a, b = np.array(pairs).T
+    diffs = verdicts[a].astype(np.float32).T - verdicts[b].astype(np.float32).T
+    observed = np.abs(diffs.sum(axis=0))
+    exceed = np.zeros(len(pairs), dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_permutations, chunk_size):
+        size = min(chunk_size, n_permutations - start)
+        signs = rng.integers(0, 2, size=(size, verdicts.shape[1]), dtype=np.int8).astype(np.float32) * 2 - 1
+        exceed += (np.abs(signs @ diffs) >= observed - 1e-6).sum(axis=0)
+    return (exceed + 1) / (n_permutations + 1)
+
+def permutation_test(a, b, n_permutations=10_000, seed=0):
+    """Paired sign-flip permutation test of mean(a) - mean(b)"""
+    return float(permutation_pvalues(np.stack([a, b]), [(0, 1)], n_permutations, seed)[0])
+
+def leaderboard(models, verdicts, means, alpha=0.05):
+    low, high = percentile_interval(means, alpha)
+    table = pd.DataFrame({
+        "model": models,
+        "score": verdicts.mean(axis=1) * 100,
+        "ci_low": low * 100,
+        "ci_high": high * 100,
+    }).sort_values("score", ascending=False, ignore_index=True).round(2)
+    table.insert(0, "rank", np.arange(1, len(table) + 1))
+    return table
+
+def pairwise(models, verdicts, means, alpha=0.05, n_permutations=10_000, seed=0):
+    """Paired bootstrap CI of the score gap plus McNemar and permutation p-values for every model pair"""
+    pairs = list(combinations(range(len(models)), 2))
+    if not pairs:
+        return pd.DataFrame()
+    p_permutation = permutation_pvalues(verdicts, pairs, n_permutations, seed)
+    rows = []
+    for (i, j), p_perm in zip(pairs, p_permutation):
+        gap = means[:, i] - means[:, j]
+        low, high = percentile_interval(gap, alpha)
+        only_a, only_b, p_mcnemar = mcnemar(verdicts[i], verdicts[j])
+        rows.append({
+            "model_a": models[i],
+            "model_b": models[j],
+            "diff": round(float(verdicts[i].mean() - verdicts[j].mean()) * 100, 2),
+            "diff_ci_low": round(float(low) * 100, 2),
+            "diff_ci_high": round(float(high) * 100, 2),
+            "only_a_correct": only_a,
+            "only_b_correct": only_b,
+            "mcnemar_p": p_mcnemar,
+            "permutation_p": float(p_perm),
+        })
+    return pd.DataFrame(rows)
+
+def compare(models, verdicts, n_resamples=10_000, alpha=0.05, n_permutations=10_000, seed=0):
+    means = bootstrap_means(verdicts, n_resamples, seed)
+    return leaderboard(models, verdicts, means, alpha), pairwise(models, verdicts, means, alpha, n_permutations, seed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard with bootstrap CIs and paired significance tests from the result store.")
+    parser.add_argument('--result_store', type=str, default=STORE_DIR, help="Root of the partitioned Parquet result store.")
+    parser.add_argument('--prompt_ids', nargs='+', default=["ko", "en"], help="Prompt ids (languages) to report.")
+    parser.add_argument('--cats', nargs='+', default=['GSM8K', 'MATH', 'OMNI_MATH', 'MMMLU', 'KSM'],
+                        help="Categories; each is reported separately and pooled as 'ALL'.")
+    parser.add_argument('--models', nargs='+', default=None, help="Models to compare (default: all in the store).")
+    parser.add_argument('--n_resamples', type=int, default=10_000, help="Bootstrap resamples.")
+    parser.add_argument('--n_permutations', type=int, default=10_000, help="Sign-flip permutations per model pair.")
+    parser.add_argument('--alpha', type=float, default=0.05, help="1 - confidence level.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default="leaderboard.json", help="JSON report path.")
+    args = parser.parse_args()
+
+    store = ResultStore(args.result_store)
+    report = {}
+    for prompt_id in args.prompt_ids:
+        for name, cats in [(c, [c]) for c in args.cats] + [("ALL", args.cats)]:
+            models, verdicts = verdict_matrix(store, prompt_id, cats, args.models)
+            if len(models) == 0:
+                logger.warning("no results for %s / %s; skipping", prompt_id, name)
+                continue
+            board, pairs = compare(models, verdicts, args.n_resamples, args.alpha, args.n_permutations, args.seed)
+            report.setdefault(prompt_id, {})[name] = {"leaderboard": board.to_dict("records"),
+                                                     "pairwise": pairs.to_dict("records")}
+            print(f"########### {prompt_id} / {name} ###########")
+            print(board.to_string(index=False))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Local OpenAI-compatible stub for exercising the API backends without a real provider.
+Serves /v1/models, /v1/chat/completions and reward-model style /v1/embeddings.
+
+    python src/stub_server.py --port 8089 --latency 0.2 --error_rate 0.05 --rate_limit_rate 0.1
+    python src/run_eval.py --model_name gpt-4o-mini --api_base http://localhost:8089/v1
+"""
+import argparse
+import json
+import random
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+    rate_limit_rate = 0.0
+    max_input_chars = None
+    pooling = "all"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _inject_faults(self):
+        time.sleep(random.uniform(0, 2 * self.latency))
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, {"Retry-After": "1"})
+            return True
+        if roll < self.rate_limit_rate + self.error_rate:
+            self._send(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send(200, {"object": "list", "data": [{"id": "stub-model", "object": "model"}]})
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self._inject_faults():
+            return
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            if self.max_input_chars and len(request["messages"][-1]["content"]) > self.max_input_chars:
+                self._send(400, {"error": {"message": "Input too long", "type": "invalid_request_error"}})
+            else:
+                self._send(200, self.chat_completion(request))
+        elif self.path.rstrip("/").endswith("/embeddings"):
+            inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+            if self.max_input_chars and any(len(text) > self.max_input_chars for text in inputs):
+                self._send(400, {"error": {"message": "Input too long", "type": "invalid_request_error"}})
+            else:
+                self._send(200, self.embeddings(request, inputs))
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def chat_completion(self, request):
+        prompt = request["messages"][-1]["content"]
+        content = f"Echo: {prompt[:64]}\nThe answer is $\\boxed{{{len(prompt)}}}$."
+        return {
+            "id": f"chatcmpl-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub-model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        }
+
+    def embeddings(self, request, inputs):
+        # Reward-model style output, as qwen2_rm.py pools it: every token's score ("all"),
+        # the scores at each paragraph break plus the final one ("step"), or just the final
+        # reward ("last"). The reward is always the last element.
+        data = []
+        for i, text in enumerate(inputs):
+            reward = (zlib.crc32(text.encode("utf-8")) % 2000) / 100 - 10
+            if self.pooling == "last":
+                embedding = [reward]
+            elif self.pooling == "step":
+                embedding = [0.0] * text.count("\n\n") + [reward]
+            else:
+                embedding = [0.0] * (len(text) // 64) + [reward]
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        return {"object": "list", "data": data, "model": request.get("model", "stub-model"),
+                "usage": {"prompt_tokens": sum(len(t) for t in inputs) // 4, "total_tokens": sum(len(t) for t in inputs) // 4}}
+
+def serve(port=8089, latency=0.0, error_rate=0.0, rate_limit_rate=0.0, max_input_chars=None, pooling="all"):
+    handler = type("ConfiguredStubHandler", (StubHandler,),
+                   {"latency": latency, "error_rate": error_rate, "rate_limit_rate": rate_limit_rate,
+                    "max_input_chars": max_input_chars, "pooling": pooling})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server with injected latency and errors.")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.1, help="Mean response latency in seconds.")
+    parser.add_argument('--error_rate', type=float, default=0.0, help="Fraction of requests answered with a 500.")
+    parser.add_argument('--rate_limit_rate', type=float, default=0.0, help="Fraction of requests answered with a 429.")
+    parser.add_argument('--max_input_chars', type=int, default=None, help="Reject chat and embedding requests with a longer input (400).")
+    parser.add_argument('--pooling', type=str, default="all", choices=["all", "step", "last"],
+                        help="Reward pooling the embeddings endpoint mimics.")
+    args = parser.parse_args()
+    server = serve(args.port, args.latency, args.error_rate, args.rate_limit_rate, args.max_input_chars, args.pooling)
+    print(f"Stub server listening on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
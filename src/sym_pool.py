@@ -0,0 +1,226 @@
+import logging
+import multiprocessing as mp
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from latex_cache import UNRESOLVED, normalize_expression
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+def _rss_mb():
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _worker(conn, max_tasks, max_rss_mb):
+    import grading
+    from latex_cache import LatexCache
+
+    # Forked workers inherit the parent's grader and SQLite-backed cache; use neither.
+    grading.symbolic_grader = None
+    grading.latex_cache = LatexCache()
+
+    done = 0
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        solution, answer, forms = task
+        # canonical forms the parent already has; only new ones are simplified here and sent back
+        grading.latex_cache.add_forms(forms)
+        verdict = grading.local_latex_expressions_equal(solution, answer)
+        new_forms = {expr: form for expr, form in grading.latex_cache.forms([solution, answer]).items()
+                     if expr not in forms}
+        done += 1
+        retiring = (max_tasks is not None and done >= max_tasks) or (max_rss_mb is not None and _rss_mb() > max_rss_mb)
+        conn.send((verdict, new_forms, retiring))
+        if retiring:
+            return
+
+class _Worker:
+    """A worker process: forked (multiprocessing.Process) or a fresh interpreter (subprocess.Popen)"""
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+    def kill(self):
+        self.process.kill()
+
+    def join(self, timeout=None):
+        if isinstance(self.process, subprocess.Popen):
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                pass
+        else:
+            self.process.join(timeout)
+
+    def is_alive(self):
+        if isinstance(self.process, subprocess.Popen):
+            return self.process.poll() is None
+        return self.process.is_alive()
+
+class SymbolicGrader:
+    """
+    Process pool for latex_expressions_equal. Every check has a hard timeout: a worker that
+    exceeds it is killed, the check comes back as UNRESOLVED, and a fresh worker takes its place.
+    Workers also retire after max_tasks_per_worker checks or once their peak RSS passes
+    max_worker_rss_mb, so sympy's caches cannot grow without bound.
+
+    The initial workers are forked, warm, by start(), which callers run before loading a
+    model. Replacements start later, possibly after CUDA is initialized or while other
+    threads run, so they are fresh interpreters (python sym_pool.py) rather than forks.
+    If start() was never called, the first map() starts the pool itself: forked when
+    fork_on_demand, else fresh interpreters, for callers that may have loaded a model or
+    started threads by then.
+    """
+
+    def __init__(self, workers=None, timeout=10.0, max_tasks_per_worker=500, max_worker_rss_mb=2048,
+                 fork_on_demand=True):
+        methods = mp.get_all_start_methods()
+        self.ctx = mp.get_context("fork" if "fork" in methods else methods[0])
+        self.n_workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_worker_rss_mb = max_worker_rss_mb
+        self.fork_on_demand = fork_on_demand
+        self.completed = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.recycled = 0
+        self.workers = []
+
+    def start(self, fresh=False):
+        if not fresh:
+            # Pay sympy's lazy imports once here so forked workers start warm.
+            import grading
+            grading.canonical_latex("x+1")
+        self.workers = [self._spawn(fresh) for _ in range(self.n_workers)]
+
+    def _spawn(self, fresh=False):
+        if fresh:
+            return self._exec()
+        parent_conn, child_conn = self.ctx.Pipe()
+        process = self.ctx.Process(target=_worker,
+                                   args=(child_conn, self.max_tasks_per_worker, self.max_worker_rss_mb),
+                                   daemon=True)
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _exec(self):
+        # spawn/forkserver would re-run the calling script (run_eval.py has no main guard), so
+        # start this module directly and talk to it over an inherited socket
+        parent_sock, child_sock = socket.socketpair()
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), str(child_sock.fileno()),
+             str(self.max_tasks_per_worker), str(self.max_worker_rss_mb)],
+            pass_fds=(child_sock.fileno(),))
+        child_sock.close()
+        return _Worker(process, Connection(parent_sock.detach()))
+
+    def _replace(self, worker, kill=False):
+        if kill:
+            worker.kill()
+        worker.join()
+        worker.conn.close()
+        self.recycled += 1
+        new_worker = self._spawn(fresh=True)
+        self.workers[self.workers.index(worker)] = new_worker
+        return new_worker
+
+    def map(self, pairs, forms=None):
+        """
+        Check (solution, answer) pairs in parallel; returns verdicts (or UNRESOLVED) in input order.
+        forms ({normalized expression: canonical form}) is sent along so workers skip those
+        simplifications, and is updated with every form the workers compute.
+        """
+        forms = {} if forms is None else forms
+        if pairs and not self.workers:
+            self.start(fresh=not self.fork_on_demand)
+        results = [False] * len(pairs)
+        pending = deque(range(len(pairs)))
+        idle = list(self.workers)
+        busy = {}
+
+        while pending or busy:
+            while pending and idle:
+                worker, i = idle.pop(), pending.popleft()
+                solution, answer = pairs[i]
+                known = {expr: forms[expr] for expr in map(normalize_expression, pairs[i]) if expr in forms}
+                worker.conn.send((solution, answer, known))
+                busy[worker.conn] = (worker, i, time.monotonic())
+
+            deadline = min(started for _, _, started in busy.values()) + self.timeout
+            for conn in wait(list(busy), timeout=max(deadline - time.monotonic(), 0)):
+                worker, i, _ = busy.pop(conn)
+                try:
+                    verdict, new_forms, retiring = conn.recv()
+                    forms.update(new_forms)
+                    self.completed += 1
+                except (EOFError, OSError):
+                    logger.warning("symbolic grading worker died on %r; counting it as incorrect", pairs[i])
+                    verdict, retiring = UNRESOLVED, True
+                    self.crashes += 1
+                results[i] = verdict
+                idle.append(self._replace(worker) if retiring else worker)
+
+            now = time.monotonic()
+            for conn, (worker, i, started) in list(busy.items()):
+                if now - started > self.timeout:
+                    del busy[conn]
+                    logger.warning("symbolic check timed out after %.1fs on %r; counting it as incorrect",
+                                   self.timeout, pairs[i])
+                    self.timeouts += 1
+                    results[i] = UNRESOLVED
+                    idle.append(self._replace(worker, kill=True))
+        return results
+
+    def close(self):
+        for worker in self.workers:
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.workers:
+            worker.join(timeout=1)
+            if worker.is_alive():
+                worker.kill()
+                worker.join()
+            worker.conn.close()
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        return {
+            'workers': self.n_workers,
+            'completed': self.completed,
+            'timeouts': self.timeouts,
+            'crashes': self.crashes,
+            'recycled': self.recycled,
+        }
+
+def _optional_int(value):
+    return None if value == "None" else int(value)
+
+if __name__ == "__main__":
+    # a replacement worker started by SymbolicGrader._exec: socket fd, max tasks, max RSS (MB)
+    _worker(Connection(int(sys.argv[1])), _optional_int(sys.argv[2]), _optional_int(sys.argv[3]))
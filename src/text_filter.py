@@ -0,0 +1,129 @@
+"""
+Translation-quality filter for OWM-scale corpora.
+
+Every per-row statistic the filters in data.py look at is computed once and stored as a
+feature column; thresholds are then applied as boolean masks, so retuning them never
+recomputes anything.
+
+    python src/text_filter.py features --hf_dataset amphora/owm-trans --strip_prefix 45 --output owm_features.parquet
+    python src/text_filter.py apply --features owm_features.parquet --output owm_filtered.parquet --max_len_diff 800
+"""
+import os
+import re
+import sys
+import argparse
+from collections import Counter
+from multiprocessing import Pool
+import numpy as np
+import pandas as pd
+
+SOURCE_COLUMN = "generated_solution"
+TARGET_COLUMN = "translated_solution"
+
+DEFAULT_THRESHOLDS = {
+    "max_len_diff": 1000,       # check_answer_len
+    "max_sentence_diff": 10,    # check_sentence_num
+    "max_digit_diff": 10,       # match_digit_num
+    "max_dup_words": 10,        # check_duplication
+    "dup_word_thres": 30,       # check_duplication: a word counts as duplicated above this many uses
+    "max_word_count": 50,       # max_duplicated
+}
+
+def digit_pattern():
+    """Every character str.isdigit accepts (match_digit_num); a superset of the regex \\d"""
+    return "[" + re.escape("".join(c for c in map(chr, range(sys.maxunicode + 1)) if c.isdigit())) + "]"
+
+def word_count_stats(texts):
+    """(counts of the repeated words in descending order, highest single word count) per text, from one Counter each"""
+    stats = []
+    for text in texts:
+        counts = Counter(text.split()).values()
+        stats.append((sorted((v for v in counts if v > 1), reverse=True), max(counts, default=0)))
+    return stats
+
+def dup_word_counts(word_counts, dup_word_thres):
+    """Words used more than dup_word_thres (>= 1) times per row of a target_word_counts column"""
+    lengths = word_counts.map(len).to_numpy()
+    flat = np.concatenate([np.asarray(c, dtype=np.int64) for c in word_counts] + [np.zeros(0, dtype=np.int64)])
+    above = np.concatenate([[0], np.cumsum(flat > dup_word_thres)])
+    ends = np.cumsum(lengths)
+    return above[ends] - above[ends - lengths]
+
+def compute_features(df, workers=None, chunk_size=20000):
+    source, target = df[SOURCE_COLUMN].astype(str), df[TARGET_COLUMN].astype(str)
+    features = pd.DataFrame(index=df.index)
+    features["source_len"] = source.str.len()
+    features["target_len"] = target.str.len()
+    features["source_sentences"] = source.str.count(r"\.") + 1
+    features["target_sentences"] = target.str.count(r"\.") + 1
+    digits = digit_pattern()
+    features["source_digits"] = source.str.count(digits)
+    features["target_digits"] = target.str.count(digits)
+
+    chunks = [target.iloc[i:i + chunk_size].tolist() for i in range(0, len(target), chunk_size)]
+    with Pool(workers or os.cpu_count()) as pool:
+        counts = pool.map(word_count_stats, chunks)
+    counts = [row for chunk in counts for row in chunk]
+    # only repeated words are kept, since every dup_word_thres is at least 1; the
+    # duplicated-word count is derived in filter_mask so the threshold can be retuned
+    features["target_word_counts"] = pd.Series([row[0] for row in counts], index=df.index, dtype=object)
+    features["target_max_word_count"] = np.array([row[1] for row in counts], dtype=np.int64)
+    return features
+
+def filter_mask(features, max_len_diff=1000, max_sentence_diff=10, max_digit_diff=10, max_dup_words=10,
+                dup_word_thres=30, max_word_count=50):
+    """True for rows that pass every filter, same as the notebook's row-by-row checks"""
+    rejected = (
+        ((features.source_len - features.target_len).abs() > max_len_diff)
+        | ((features.target_sentences - features.source_sentences).abs() > max_sentence_diff)
+        | ((features.target_digits - features.source_digits).abs() > max_digit_diff)
+        | (dup_word_counts(features.target_word_counts, dup_word_thres) > max_dup_words)
+        | (features.target_max_word_count > max_word_count)
+    )
+    return ~rejected
+
+def load_input(args):
+    if args.hf_dataset:
+        from datasets import load_dataset
+        df = pd.DataFrame(load_dataset(args.hf_dataset)[args.split])
+    elif args.input.endswith(".parquet"):
+        df = pd.read_parquet(args.input)
+    else:
+        df = pd.read_csv(args.input)
+    if args.strip_prefix:
+        for col in ["translated_question", "translated_solution"]:
+            df[col] = df[col].str[args.strip_prefix:].str.strip()
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description='Translation-quality filter with precomputed text features')
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    features_parser = sub.add_parser("features", help="Compute per-row text statistics once and store them with the rows")
+    features_parser.add_argument('--input', type=str, help="CSV or Parquet file with the corpus")
+    features_parser.add_argument('--hf_dataset', type=str, default=None, help="Load the corpus from the hub instead")
+    features_parser.add_argument('--split', type=str, default="train")
+    features_parser.add_argument('--strip_prefix', type=int, default=0, help="Drop this many leading characters from the translated columns")
+    features_parser.add_argument('--workers', type=int, default=os.cpu_count())
+    features_parser.add_argument('--output', type=str, required=True, help="Parquet file of rows plus feature columns")
+
+    apply_parser = sub.add_parser("apply", help="Apply thresholds to a features file as boolean masks")
+    apply_parser.add_argument('--features', type=str, required=True)
+    apply_parser.add_argument('--output', type=str, required=True)
+    for name, default in DEFAULT_THRESHOLDS.items():
+        apply_parser.add_argument(f'--{name}', type=int, default=default)
+    args = parser.parse_args()
+
+    if args.command == "features":
+        df = load_input(args)
+        df = pd.concat([df, compute_features(df, args.workers)], axis=1)
+        df.to_parquet(args.output, index=False)
+        print(f"Wrote {len(df)} rows with features to '{args.output}'")
+    else:
+        df = pd.read_parquet(args.features)
+        mask = filter_mask(df, **{name: getattr(args, name) for name in DEFAULT_THRESHOLDS})
+        df[mask.to_numpy()].to_parquet(args.output, index=False)
+        print(f"Kept {int(mask.sum())} of {len(df)} rows ({mask.mean() * 100:.2f}%), saved to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import hashlib
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from grading import batch_grade, extract_answer_frame, take_unresolved, GRADER_VERSION
+
+def row_keys(category, solutions, answers, questions, version=GRADER_VERSION, namespace=""):
+    """Content hash of every (namespace, category, question, solution, answer, grader version) row"""
+    keys = []
+    for question, solution, answer in zip(questions, solutions, answers):
+        payload = "\x1f".join([version, namespace, category, str(question), str(solution), str(answer)])
+        keys.append(hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest())
+    return keys
+
+class VerdictStore:
+    """Per-row grading verdicts persisted in SQLite, keyed by row_keys()"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, correct INTEGER)")
+
+    def get_many(self, keys, chunk_size=900):
+        found = {}
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            for key, correct in self.conn.execute(
+                    f"SELECT key, correct FROM verdicts WHERE key IN ({placeholders})", chunk):
+                found[key] = bool(correct)
+        return found
+
+    def put_many(self, items):
+        self.conn.executemany("INSERT OR REPLACE INTO verdicts (key, correct) VALUES (?, ?)",
+                              [(key, int(correct)) for key, correct in items])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def grade_incremental(store, category, solutions, answers, questions, namespace=""):
+    """
+    batch_grade that only grades rows the store has not seen. namespace (e.g. the
+    dataset_store fingerprint) scopes the keys to one dataset snapshot.
+    Returns (correctness array, number of rows actually graded). Rows that failed only
+    because a symbolic check timed out or crashed are not persisted, so they are re-graded.
+    """
+    solutions, answers, questions = (pd.Series(np.asarray(col, dtype=object)) for col in (solutions, answers, questions))
+    keys = row_keys(category, solutions, answers, questions, namespace=namespace)
+    known = store.get_many(keys)
+    correct = np.array([known.get(key, False) for key in keys], dtype=bool)
+    todo = np.array([key not in known for key in keys], dtype=bool)
+    if todo.any():
+        take_unresolved()
+        correct[todo] = batch_grade(category, solutions[todo], answers[todo], questions[todo])
+        persist = todo.copy()
+        unresolved = take_unresolved()
+        if unresolved:
+            contents = extract_answer_frame(solutions[todo]).boxed_content
+            retry = contents.isin(unresolved).to_numpy() & ~correct[todo]
+            persist[np.flatnonzero(todo)[retry]] = False
+        store.put_many(zip(np.asarray(keys, dtype=object)[persist], correct[persist]))
+    return correct, int(todo.sum())